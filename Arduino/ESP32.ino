@@ -315,20 +315,20 @@ void wifi(){
 void sendSensorData() {
   int LED_state = digitalRead(LED_PIN);
   int FAN_state = digitalRead(COOLING_FAN_PIN);
-  // === sensor.txt 문자열 만들기 ===
-  String sensorData = "";
-  sensorData += "온도: " + String(airTemp) + " C\n";
-  sensorData += "습도: " + String(airMoist) + " %\n";
-  sensorData += "토양습도: " + String(soilMoist) + " %\n";
-  sensorData += "물수위: " + String(waterLevelPercent) + " %\n";
-  sensorData += "LED: " + String(LED_state) + "\n";
-  sensorData += "FAN: " + String(FAN_state) + "\n";
+  // === 압축 key=value 형식 (t=온도&h=습도&s=토양습도&w=물수위&l=LED&f=FAN) ===
+  // 예전 "온도: 23 C\n..." 텍스트보다 짧고, 서버는 두 형식 모두 받음
+  String sensorData = "t=" + String(airTemp)
+                    + "&h=" + String(airMoist)
+                    + "&s=" + String(soilMoist)
+                    + "&w=" + String(waterLevelPercent, 1)
+                    + "&l=" + String(LED_state)
+                    + "&f=" + String(FAN_state);
 
   // === 서버로 POST 전송 ===
   if (WiFi.status() == WL_CONNECTED) {
       HTTPClient http;
       http.begin(uploadUrl);   // ✅ 업로드 전용 주소
-      http.addHeader("Content-Type", "text/plain"); // sensor.txt 형식
+      http.addHeader("Content-Type", "text/plain"); // key=value 한 줄
       int httpCode = http.POST(sensorData);
       if (httpCode > 0) {
           Serial.printf("POST 응답: %d\n", httpCode);
@@ -37,7 +37,7 @@ preprocess = transforms.Compose([
 ])
 
 def build_model(num_classes):
-    m = models.efficientnet_b0(weights='IMAGENET1K_V1')
+    m = models.efficientnet_b0(weights=None)  # 가중치는 아래 load_state_dict로 덮어씀
     in_f = m.classifier[1].in_features
     m.classifier = nn.Sequential(nn.Dropout(0.3), nn.Linear(in_f, num_classes))
     return m
@@ -1,13 +1,35 @@
+import time
+STARTUP_T0 = time.perf_counter()  # 시작 시간 측정용 (무거운 import 전에 기록)
+
 import os
-import io
+import atexit
 import datetime
-import sqlite3
-from flask import Flask, request, Response, jsonify, send_from_directory, render_template
-from PIL import Image
+import io
+from flask import Flask, request, Response, jsonify, send_file, render_template, abort
+from werkzeug.security import safe_join
 
 import torch
-import torch.nn as nn
-from torchvision import models, transforms
+
+from model_registry import ModelRegistry, build_model
+from preprocess import decode_image
+from pred_cache import PredictionCache, image_key
+from upload_worker import WorkerPool
+from proc_pool import ProcessInferencePool
+from db import Database, WriteBehindBuffer
+from presence import DevicePresence
+from events import EventBroker
+from commands import CommandHub, CMD_IDLE, device_kind
+from ingest import BadUpload, save_stream, file_digest
+from storage import UploadStore
+from derivatives import make_derivatives, find_variant
+from static_files import StaticIndex
+from retention import RetentionManager
+import timeseries
+from timeseries import SensorTimeSeries, parse_time
+from sensor_state import SensorStateStore, empty_state
+import sensor_payload
+
+STARTUP_IMPORT_S = time.perf_counter() - STARTUP_T0
 
 # ===== 경로 설정 =====
 BACKEND_DIR = os.path.dirname(__file__)
@@ -16,131 +38,249 @@ FRONTEND_DIR = os.path.join(BACKEND_DIR, "..", "FrontEnd")
 UPLOAD_DIR = os.path.join(BACKEND_DIR, "uploads")
 DB_PATH = os.path.join(BACKEND_DIR, "cam_server.db")
 SENSOR_DB_PATH = os.path.join(BACKEND_DIR, "sensor_server.db")  # ✅ 센서 전용 DB 추가
+ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR", os.path.join(BACKEND_DIR, "archive"))
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+# uploads/YYYY/MM/DD/{장치ID}_{시각}_{순번}.jpg (같은 초에 올라와도 덮어쓰지 않음)
+upload_store = UploadStore(UPLOAD_DIR)
+
+# ===== DB 연결 풀 (WAL) =====
+cam_db = Database(DB_PATH)
+sensor_db = Database(SENSOR_DB_PATH)
 
+# dist 파일은 Flask 기본 static 라우트 대신 serve_react가 메모리 색인(StaticIndex)으로 서빙
 app = Flask(__name__, 
-            static_folder=REACT_DIST, 
-            static_url_path="/",
+            static_folder=None,
             template_folder=FRONTEND_DIR)
 
 # ===== AI 모델 설정 =====
-MODEL_PATH = os.path.expanduser("/home/student_15020/best_lettuce_disease_model.pth")
-CLASS_IDS = ['0', '9', '10']
-CLASS_NAMES = {'0': '정상', '9': '상추균핵병', '10': '상추노균병'}
-
-preprocess = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.ToTensor(),
-    transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225]),
-])
-
-def build_model(num_classes):
-    m = models.efficientnet_b0(weights='IMAGENET1K_V1')
-    in_f = m.classifier[1].in_features
-    m.classifier = nn.Sequential(nn.Dropout(0.3), nn.Linear(in_f, num_classes))
-    return m
+# MODEL_DIR 안의 {crop}_disease_model_full.pth / best_{crop}_disease_model.pth 들을 작물별로 자동 등록
+# (기존 best_lettuce_disease_model.pth 도 그대로 lettuce로 등록됨)
+MODEL_DIR = os.path.expanduser(os.environ.get("MODEL_DIR", "/home/student_15020"))
+DEFAULT_CROP = "lettuce"
+# 서버 시작 시 미리 로드할 작물 (쉼표 구분, 비우면 첫 요청 때 로드)
+PRELOAD_CROPS = [c for c in os.environ.get("PRELOAD_CROPS", "").split(",") if c]
+MODEL_CACHE_SIZE = int(os.environ.get("MODEL_CACHE_SIZE", "2"))  # 메모리에 동시에 올려둘 모델 수
+# 추론 백엔드: auto(ONNX -> TorchScript -> eager) / onnx / torchscript / int8 / eager
+# ONNX/TorchScript 파일은 export_model.py, INT8 파일은 quantize_model.py 로 MODEL_DIR에 생성
+INFER_BACKEND = os.environ.get("INFER_BACKEND", "auto")
 
 device = torch.device("cpu")
-model = build_model(len(CLASS_IDS))
-state = torch.load(MODEL_PATH, map_location=device)
-model.load_state_dict(state)
-model.eval().to(device)
-
-# ===== 전역 flag =====
-flags = {
-    "cam_pending": False,
-    "esp32_pending": False
-}
-
-# ===== 센서 데이터 저장 (메모리) =====
-latest_sensor_data = {
-    "temperature": None,
-    "humidity": None,
-    "soil_moisture": None,
-    "water_level": None,
-    "timestamp": None
-}
+
+# ===== 배치 추론 큐 =====
+# 동시에 들어온 예측 요청을 최대 BATCH_MAX_SIZE개까지, 첫 요청 후 BATCH_MAX_WAIT_MS 동안 모아서 한 번에 추론
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", "10"))
+
+# ===== 작물별 모델 레지스트리 (첫 요청 시 로드, LRU 제거) =====
+registry = ModelRegistry(MODEL_DIR, build_model, device,
+                         capacity=MODEL_CACHE_SIZE,
+                         max_batch=BATCH_MAX_SIZE,
+                         max_wait_ms=BATCH_MAX_WAIT_MS,
+                         backend=INFER_BACKEND)
+
+# ===== 멀티 프로세스 추론 (INFER_PROCS > 0 이면 디코딩/추론을 워커 프로세스에서) =====
+# fork 전에 다른 스레드가 없어야 하므로 워커 스레드들보다 먼저 생성
+INFER_PROCS = int(os.environ.get("INFER_PROCS", "0"))
+# 이 시간 안에 결과가 없으면 요청 실패 -> 503 (워커가 죽으면 처리 중이던 요청은 바로 실패하고 워커는 재시작)
+INFER_TIMEOUT_S = float(os.environ.get("INFER_TIMEOUT_S", "60"))
+proc_pool = None
+if INFER_PROCS > 0:
+    proc_pool = ProcessInferencePool(MODEL_DIR, num_procs=INFER_PROCS, backend=INFER_BACKEND,
+                                     capacity=MODEL_CACHE_SIZE, preload=PRELOAD_CROPS,
+                                     max_batch=BATCH_MAX_SIZE, timeout_s=INFER_TIMEOUT_S)
+
+# ===== 장치 명령 큐 (/trigger/* -> /get 응답 201) =====
+# /get?wait=초 를 주면 명령이 올 때까지(최대 LONGPOLL_MAX_S) 응답을 보류
+LONGPOLL_MAX_S = float(os.environ.get("LONGPOLL_MAX_S", "25"))
+commands = CommandHub()
+
+# ===== 센서 데이터 저장 (메모리, 장치별) =====
+sensor_state = SensorStateStore()
+
+# ===== 실시간 이벤트 (SSE, /api/events) =====
+# 새 센서값/카메라 업로드/진단 완료를 대시보드로 바로 전달 (폴링 대신)
+events = EventBroker()
+
+# 같은 SQL 문자열을 쓰면 연결별 statement 캐시에서 재사용됨
+SQL_INSERT_DEVICE_LOG = "INSERT INTO device_logs (device_id, timestamp, status) VALUES (?, ?, ?)"
+SQL_INSERT_UPLOAD = """
+    INSERT INTO uploads (file_path, timestamp, crop, device_id, rel_path) VALUES (?, ?, ?, ?, ?)
+"""
+SQL_UPDATE_DIAGNOSIS = """
+    UPDATE uploads SET disease_code = ?, disease_name = ?, confidence = ?, diagnosed_at = ?
+    WHERE file_path = ?
+"""
 
 # ===== DB 초기화 =====
+UPLOAD_DIAGNOSIS_COLUMNS = [
+    ("crop", "TEXT"),
+    ("disease_code", "TEXT"),
+    ("disease_name", "TEXT"),
+    ("confidence", "REAL"),
+    ("diagnosed_at", "TEXT"),
+]
+UPLOAD_STORAGE_COLUMNS = [
+    ("device_id", "TEXT"),
+    ("rel_path", "TEXT"),  # UPLOAD_DIR 기준 상대 경로 (예전 행은 NULL -> 파일 이름으로 찾음)
+]
+
+def add_missing_columns(conn, table, columns):
+    """기존 DB에 없는 컬럼 추가"""
+    cols = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, typ in columns:
+        if name not in cols:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {typ}")
+
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS device_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            device_id TEXT,
-            timestamp TEXT,
-            status TEXT
-        )
-    """)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS uploads (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            file_path TEXT,
-            timestamp TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
+    with cam_db.transaction() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS device_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                device_id TEXT,
+                timestamp TEXT,
+                status TEXT
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS uploads (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                file_path TEXT,
+                timestamp TEXT
+            )
+        """)
+        # 자동 진단 결과 컬럼
+        add_missing_columns(conn, "uploads", UPLOAD_DIAGNOSIS_COLUMNS)
+        add_missing_columns(conn, "uploads", UPLOAD_STORAGE_COLUMNS)
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_uploads_rel_path ON uploads (rel_path)")
+        # 갤러리/업로드 목록: 장치별로 id 내림차순 페이지 조회
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_uploads_device_id ON uploads (device_id, id)")
+        # 진단 결과는 file_path로 찾아서 기록
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_uploads_file_path ON uploads (file_path)")
+        # 보관 정리 시 오래된 행부터 찾기 위한 시간 인덱스
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_uploads_timestamp ON uploads (timestamp)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_device_logs_timestamp ON device_logs (timestamp)")
+        # 장치별 마지막 접속 상태 (장치당 1행)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS device_presence (
+                device_id TEXT PRIMARY KEY,
+                last_seen REAL,
+                status TEXT,
+                since REAL
+            )
+        """)
 
 def init_sensor_db():
-    conn = sqlite3.connect(SENSOR_DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS sensor_data (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            temperature REAL,
-            humidity REAL,
-            soil_moisture INTEGER,
-            water_level REAL,
-            timestamp TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-def insert_device_log(device_id, status):
-    ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("INSERT INTO device_logs (device_id, timestamp, status) VALUES (?, ?, ?)",
-                (device_id, ts, status))
-    conn.commit()
-    conn.close()
-
-def insert_upload_log(file_path):
+    """센서 시계열 테이블 생성 (기존 sensor_data 행은 처음 한 번 sensor_readings로 이전)"""
+    with sensor_db.transaction() as conn:
+        timeseries.init_tables(conn)
+        moved = timeseries.migrate_legacy(conn)
+    if moved:
+        print(f"[센서 DB] 기존 sensor_data {moved}행 이전 완료")
+
+# ===== 쓰기 지연 버퍼 (폴링/업로드 응답이 디스크 기록을 기다리지 않도록) =====
+# WRITE_BUFFER_ROWS개가 쌓이거나 WRITE_BUFFER_MS가 지나면 한 트랜잭션으로 기록
+WRITE_BUFFER_ROWS = int(os.environ.get("WRITE_BUFFER_ROWS", "500"))
+WRITE_BUFFER_MS = int(os.environ.get("WRITE_BUFFER_MS", "1000"))
+cam_writes = WriteBehindBuffer(cam_db, WRITE_BUFFER_ROWS, WRITE_BUFFER_MS, name="cam-writes")
+sensor_writes = WriteBehindBuffer(sensor_db, WRITE_BUFFER_ROWS, WRITE_BUFFER_MS, name="sensor-writes")
+
+def flush_writes():
+    """종료 시 남은 기록 저장"""
+    cam_writes.stop()
+    sensor_writes.stop()
+
+atexit.register(flush_writes)
+
+# ===== 예측 결과 캐시 (이미지 해시 + 모델 버전) =====
+PRED_CACHE_SIZE = int(os.environ.get("PRED_CACHE_SIZE", "2048"))
+PRED_CACHE_PERSIST = os.environ.get("PRED_CACHE_PERSIST", "1") == "1"  # cam_server.db에 같이 저장
+PRED_CACHE_DB_ROWS = int(os.environ.get("PRED_CACHE_DB_ROWS", "50000"))  # pred_cache 테이블 최대 행 수
+pred_cache = PredictionCache(PRED_CACHE_SIZE, cam_db if PRED_CACHE_PERSIST else None,
+                             writes=cam_writes, max_rows=PRED_CACHE_DB_ROWS)
+
+# ===== 장치 접속 상태 (상태가 바뀔 때만 device_logs 기록) =====
+# n2: 장치 정기 통신 주기, n1: 응답 대기 시간
+# ESP32-CAM은 /get 사이에 60초 쉬고 요청 자체도 최대 60초(TIMEOUT) 걸릴 수 있음 (Arduino/ESP32CAM/ESP32CAM.ino)
+# ESP32는 loop()마다(10초 + 센서/관수 처리) /get (Arduino/ESP32.ino)
+PRESENCE_PING_S = float(os.environ.get("PRESENCE_PING_S", "30"))
+PRESENCE_PING_CAM_S = float(os.environ.get("PRESENCE_PING_CAM_S", "120"))
+PRESENCE_PING_ESP32_S = float(os.environ.get("PRESENCE_PING_ESP32_S", "30"))
+PRESENCE_TIMEOUT_S = float(os.environ.get("PRESENCE_TIMEOUT_S", "10"))
+PRESENCE_SNAPSHOT_S = float(os.environ.get("PRESENCE_SNAPSHOT_S", "60"))
+presence = DevicePresence(cam_writes, SQL_INSERT_DEVICE_LOG,
+                          ping_interval_s=PRESENCE_PING_S,
+                          ping_intervals={"ESP32CAM": PRESENCE_PING_CAM_S, "ESP32": PRESENCE_PING_ESP32_S},
+                          kind_of=device_kind,
+                          response_timeout_s=PRESENCE_TIMEOUT_S,
+                          snapshot_s=PRESENCE_SNAPSHOT_S)
+# atexit은 역순 실행: 상태 스냅샷을 버퍼에 넣은 뒤 flush_writes가 기록
+atexit.register(presence.stop)
+
+# ===== 보관 정리 (오래된 원본 행 -> archive/ 날짜별 gzip CSV, 롤업은 계속 보관) =====
+# 기간(일)이 0 이면 해당 테이블은 정리하지 않음
+RETENTION_SENSOR_DAYS = float(os.environ.get("RETENTION_SENSOR_DAYS", "30"))
+RETENTION_LOG_DAYS = float(os.environ.get("RETENTION_LOG_DAYS", "90"))
+RETENTION_UPLOAD_DAYS = float(os.environ.get("RETENTION_UPLOAD_DAYS", "365"))
+RETENTION_INTERVAL_S = float(os.environ.get("RETENTION_INTERVAL_S", "3600"))
+retention = RetentionManager(ARCHIVE_DIR, interval_s=RETENTION_INTERVAL_S)
+retention.add(sensor_db, "sensor_readings", "ts", RETENTION_SENSOR_DAYS, epoch=True)
+retention.add(cam_db, "device_logs", "timestamp", RETENTION_LOG_DAYS)
+retention.add(cam_db, "uploads", "timestamp", RETENTION_UPLOAD_DAYS)  # 이미지 파일은 그대로 둠
+atexit.register(retention.stop)
+
+def insert_upload_log(file_path, crop=None, device_id=None, after=None):
+    """after: 행이 커밋된 뒤 호출 (ts 인자)"""
     ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("INSERT INTO uploads (file_path, timestamp) VALUES (?, ?)",
-                (file_path, ts))
-    conn.commit()
-    conn.close()
-
-def insert_sensor_data(temp, hum, soil, water, led, fan):
-    """센서 데이터를 sensor_server.db에 저장"""
+    cam_writes.add(SQL_INSERT_UPLOAD, (file_path, ts, crop, device_id, upload_store.rel_path(file_path)),
+                   after=after and (lambda: after(ts)))
+
+def update_upload_diagnosis(file_path, result, after=None):
+    """자동 진단 결과를 uploads 행에 기록 (같은 버퍼라 INSERT 이후에 실행됨, after: 커밋 후 호출)"""
     ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    conn = sqlite3.connect(SENSOR_DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO sensor_data (temperature, humidity, soil_moisture, water_level, led_state, fan_state, timestamp)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (temp, hum, soil, water, led, fan, ts))
-    conn.commit()
-    conn.close()
+    cam_writes.add(SQL_UPDATE_DIAGNOSIS, (result["disease_code"], result["disease_name"],
+                                          result["confidence"], ts, file_path), after=after)
+
+# ===== 센서 시계열 (원본 + 1분/1시간/1일 롤업) =====
+sensor_ts = SensorTimeSeries(sensor_db, sensor_writes)
+
+def record_sensor_data(device_id, reading, ts=None):
+    """장치별 최신값 갱신 + sensor_server.db에 장치 ID와 함께 저장 (ts: 측정 시각, 없으면 지금)"""
+    now = ts or time.time()
+    state = sensor_state.update(device_id, reading, now)
+    sensor_ts.add(device_id, reading, now)
+    events.publish("sensor", device_id, state)
+    return state
 
 # ===== React SPA 서빙 =====
+static_index = StaticIndex(REACT_DIST)
+
 @app.route("/", defaults={"path": ""})
 @app.route("/<path:path>")
 def serve_react(path):
     if path.startswith("api/") or path in ["get", "upload", "trigger", "gallery", "uploads", "level"]:
         return jsonify({"error": "Not Found"}), 404
-    
-    file_path = os.path.join(REACT_DIST, path)
-    if os.path.exists(file_path) and os.path.isfile(file_path):
-        return send_from_directory(REACT_DIST, path)
-    return send_from_directory(REACT_DIST, "index.html")
+
+    # 없는 경로는 색인에서 바로 index.html (SPA 라우팅), 파일 시스템 확인 없음
+    entry = static_index.lookup(path or "index.html")
+    if entry is None:
+        return jsonify({"error": "FrontEnd/dist not built"}), 404
+    # Accept-Encoding에 맞춰 미리 압축한 .br/.gz를 그대로 보냄 (요청마다 압축하지 않음)
+    encoding, rep = entry.negotiate(request.accept_encodings)
+    # send_file(conditional=True): If-None-Match / If-Modified-Since -> 304, Range -> 206
+    rv = send_file(io.BytesIO(rep.data) if rep.data is not None else rep.path,
+                   mimetype=entry.mimetype, etag=rep.etag, last_modified=entry.mtime,
+                   conditional=True)
+    if encoding:
+        rv.headers["Content-Encoding"] = encoding
+    if entry.vary:
+        rv.vary.add("Accept-Encoding")  # 프록시/브라우저 캐시가 인코딩별로 따로 저장하도록
+    rv.headers["Cache-Control"] = entry.cache_control
+    return rv
+
+@app.get("/api/static/stats")
+def static_stats():
+    return jsonify({"ok": True, "static": static_index.stats()})
 
 # ===== API: Health Check =====
 @app.get("/api/health")
@@ -150,63 +290,224 @@ def health():
 # ===== API: AI 예측 =====
 ALLOWED = {"jpg", "jpeg", "png", "bmp", "webp"}
 
+class BadImage(ValueError):
+    pass
+
+class InferenceUnavailable(RuntimeError):
+    """추론 워커 시간 초과/종료 (요청은 다시 보내면 됨)"""
+    pass
+
+def classify(data, crop, digest=None):
+    """이미지 bytes 진단 -> (결과 dict, 캐시 사용 여부)
+
+    digest: 캐시 키로 쓸 원본 이미지 해시 (data가 원본을 줄인 변형일 때)
+    """
+    key = image_key(data, registry.version(crop), digest)
+    cached = pred_cache.get(key)
+    if cached is not None:
+        # 같은 이미지 + 같은 모델이면 디코딩/추론 없이 바로 반환
+        return cached, True
+
+    if proc_pool is not None:
+        # 워커 프로세스에서 디코딩 + 추론
+        try:
+            out = proc_pool.predict(crop, data)
+        except ValueError as e:
+            raise BadImage(str(e))
+        except RuntimeError as e:
+            raise InferenceUnavailable(str(e))
+        probs = out["probs"]
+        idx = max(range(len(probs)), key=probs.__getitem__)
+        conf = probs[idx]
+        class_ids, class_names, backend = out["class_ids"], out["class_names"], out["backend"]
+    else:
+        try:
+            # JPEG draft 디코딩 + 224 리사이즈 (정규화는 배치 큐에서 배치 단위로)
+            x = decode_image(data)
+        except Exception as e:
+            raise BadImage(str(e))
+
+        entry, prob = registry.predict(crop, x)
+        idx = int(prob.argmax().item())
+        conf = float(prob[idx].item())
+        class_ids, class_names, backend = entry.class_ids, entry.class_names, entry.backend
+
+    code = class_ids[idx]
+    result = {
+        "crop": crop,
+        "class_idx": idx,
+        "disease_code": code,
+        "disease_name": class_names.get(code, code),
+        "backend": backend,
+        "confidence": round(conf, 4)
+    }
+    pred_cache.put(key, result)
+    return result, False
+
 @app.post("/api/predict")
 def predict():
     if "file" not in request.files:
         return jsonify({"ok": False, "error": "no file"}), 400
     f = request.files["file"]
+    crop = request.args.get("crop", DEFAULT_CROP)
+    if crop not in registry.crops():
+        return jsonify({"ok": False, "error": f"unknown crop: {crop}", "crops": registry.crops()}), 400
     ext_ok = "." in f.filename and f.filename.rsplit(".", 1)[1].lower() in ALLOWED
     if not f.filename or not ext_ok:
         return jsonify({"ok": False, "error": "bad filename/ext"}), 400
 
     try:
-        img = Image.open(io.BytesIO(f.read())).convert("RGB")
-    except Exception as e:
+        result, cached = classify(f.read(), crop)
+    except BadImage as e:
         return jsonify({"ok": False, "error": f"bad image: {e}"}), 400
+    except InferenceUnavailable as e:
+        return jsonify({"ok": False, "error": f"inference unavailable: {e}"}), 503
+    return jsonify({"ok": True, **result, "cached": cached})
 
-    x = preprocess(img).unsqueeze(0).to(device)
-    with torch.no_grad():
-        logits = model(x)
-        prob = torch.softmax(logits, dim=1)[0]
-        idx = int(prob.argmax().item())
-        conf = float(prob[idx].item())
+# ===== 업로드 사진 자동 진단 (백그라운드 워커) =====
+DIAGNOSIS_WORKERS = int(os.environ.get("DIAGNOSIS_WORKERS", "2"))
+DIAGNOSIS_QUEUE_MAX = int(os.environ.get("DIAGNOSIS_QUEUE_MAX", "1000"))
 
-    code = CLASS_IDS[idx]
+def diagnose_upload(job):
+    """job = (파일 경로, 작물, 장치 ID, 원본 해시) -> 썸네일/224 변형 생성, 진단 후 uploads 행에 결과 저장"""
+    path, crop, device_id, digest = job
+    try:
+        # 원본은 여기서 한 번만 디코딩하고, 진단은 미리 줄여 둔 224 변형으로
+        data = make_derivatives(path)
+    except Exception as e:
+        print(f"[변형 생성 실패] {os.path.basename(path)}: {e}")
+        with open(path, "rb") as f:
+            data = f.read()
+    if crop not in registry.crops():
+        return
+    # 캐시 키는 원본 해시 (대시보드가 같은 사진을 /api/predict로 보내면 그대로 재사용)
+    result, _ = classify(data, crop, digest or file_digest(path))
+    # 이벤트는 커밋된 뒤에 보냄 (받자마자 /api/uploads를 다시 읽는 대시보드가 결과를 보도록)
+    update_upload_diagnosis(path, result, after=lambda: events.publish("diagnosis", device_id, {
+        "filename": os.path.basename(path),
+        "url": upload_store.url(path, upload_store.rel_path(path)),
+        "diagnosis": {k: result[k] for k in ("crop", "disease_code", "disease_name", "confidence")},
+    }))
+    print(f"[자동 진단] {os.path.basename(path)} -> {result['disease_name']} ({result['confidence']})")
+
+diagnosis_pool = WorkerPool(diagnose_upload, num_workers=DIAGNOSIS_WORKERS,
+                            name="diagnosis", max_queue=DIAGNOSIS_QUEUE_MAX)
+
+@app.get("/api/diagnosis/stats")
+def diagnosis_stats():
+    """자동 진단 큐 길이 / 워커 사용률 / 처리 시간"""
+    return jsonify({"ok": True, "diagnosis": diagnosis_pool.stats()})
+
+# ===== API: 모델/배치 추론 통계 (작물별 배치 크기 히스토그램) =====
+@app.get("/api/predict/stats")
+def predict_stats():
+    return jsonify({"ok": True, "models": registry.stats(), "cache": pred_cache.stats(),
+                    "procs": proc_pool.stats() if proc_pool else None})
+
+# ===== API: DB 연결 풀 / 쓰기 지연 버퍼 통계 =====
+@app.get("/api/db/stats")
+def db_stats():
     return jsonify({
         "ok": True,
-        "class_idx": idx,
-        "disease_code": code,
-        "disease_name": CLASS_NAMES[code],
-        "confidence": round(conf, 4)
+        "pools": {"cam": cam_db.stats(), "sensor": sensor_db.stats()},
+        "write_behind": {"cam": cam_writes.stats(), "sensor": sensor_writes.stats()},
+        "retention": retention.stats(),
     })
 
+# ===== API: 사용 가능한 작물 목록 =====
+@app.get("/api/crops")
+def api_crops():
+    return jsonify({"ok": True, "crops": registry.crops(), "default": DEFAULT_CROP})
+
 # ===== ESP32: GET 폴링 =====
 @app.get("/get")
 def get_poll():
+    """?id=장치ID[&wait=초] -> 201(할 일 있음) / 200(없음) / 400(알 수 없는 장치)"""
     device_id = request.args.get("id", "UNKNOWN")
-    insert_device_log(device_id, "Online")
-
-    if device_id.startswith("ESP32CAM"):
-        if flags["cam_pending"]:
-            flags["cam_pending"] = False
-            return Response("201", mimetype="text/plain")
-        return Response("200", mimetype="text/plain")
-
-    elif device_id.startswith("ESP32"):
-        if flags["esp32_pending"]:
-            flags["esp32_pending"] = False
-            return Response("201", mimetype="text/plain")
-        return Response("200", mimetype="text/plain")
-
-    return Response("400", mimetype="text/plain")  # 알 수 없는 장치
+    presence.seen(device_id)
+    if device_kind(device_id) is None:
+        return Response("400", mimetype="text/plain")  # 알 수 없는 장치
+
+    wait = parse_wait(request.args.get("wait"))
+    command = commands.wait(device_id, wait)
+    if wait:
+        presence.seen(device_id)  # 오래 대기한 뒤에도 접속 중으로 유지
+    return Response(command or CMD_IDLE, mimetype="text/plain")
+
+def parse_wait(value):
+    """롱 폴링 대기 시간 (0 ~ LONGPOLL_MAX_S초)"""
+    try:
+        return min(max(float(value or 0), 0.0), LONGPOLL_MAX_S)
+    except ValueError:
+        return 0.0
 
 # ===== ESP32 / ESP32-CAM: 업로드 처리 =====
+# 아래 함수들은 Flask(upload)와 asyncio 게이트웨이(gateway.py)가 같이 사용
+# CAM 사진은 본문을 메모리에 모으지 않고 조각째 임시 파일에 쓴 뒤 uploads/로 이동
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+# 센서 본문은 한 건에 수십 바이트, 여러 건을 모아 보내도 이 정도면 충분
+MAX_SENSOR_BYTES = int(os.environ.get("MAX_SENSOR_BYTES", str(64 * 1024)))
+
+def cam_upload_path(device_id, ext=".jpg"):
+    """새 사진 저장 경로 예약 (빈 파일이 만들어짐, 실패하면 discard_upload로 지움)"""
+    return upload_store.reserve(device_id, ext)
+
+def discard_upload(path):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+def accept_cam_upload(device_id, saved_path, crop=None, digest=None):
+    """저장이 끝난 CAM 사진 -> uploads 기록, 이벤트 전송, 백그라운드 진단 등록"""
+    if crop not in registry.crops():
+        crop = DEFAULT_CROP
+    # 이벤트는 uploads 행이 커밋된 뒤에 보냄 (받자마자 /api/uploads를 다시 읽어도 새 사진이 보이도록)
+    insert_upload_log(saved_path, crop, device_id, after=lambda ts: events.publish("upload", device_id, {
+        "filename": os.path.basename(saved_path),
+        "url": upload_store.url(saved_path, upload_store.rel_path(saved_path)),
+        "timestamp": ts,
+        "crop": crop,
+    }))
+    print(f"[CAM 업로드] {saved_path}")
+
+    # 썸네일 생성 + 진단은 백그라운드에서 (업로드 응답은 바로 반환)
+    diagnosis_pool.submit((saved_path, crop, device_id, digest))
+
+def read_limited(read, limit):
+    """read(n)으로 최대 limit바이트까지 읽기 (한 번에 다 안 올 수 있어서 반복)"""
+    chunks, size = [], 0
+    while size < limit:
+        chunk = read(limit - size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size += len(chunk)
+    return b"".join(chunks)
+
+def accept_sensor_upload(device_id, body):
+    """ESP32 센서 본문(bytes) 파싱 + 저장 -> {"format", "readings"}
+
+    바이너리 / key=value / 기존 텍스트 형식 모두 받음 (sensor_payload 참고).
+    값은 sensor_server.db에만 저장하고 요청마다 .txt 파일을 만들지 않는다.
+    """
+    if len(body) > MAX_SENSOR_BYTES:
+        raise BadUpload(f"sensor payload larger than {MAX_SENSOR_BYTES} bytes", status=413)
+    fmt, readings = sensor_payload.parse(body)
+    for ts, reading in readings:
+        record_sensor_data(device_id, reading, ts)
+
+    last = readings[-1][1]
+    print(f"[ESP32 센서 업로드] {fmt} {len(readings)}건, 온도:{last['temperature']}°C, 습도:{last['humidity']}%, "
+          f"토양:{last['soil_moisture']}, 수위:{last['water_level']}%, LED:{last['led_state']}, FAN:{last['fan_state']}")
+    return {"format": fmt, "readings": len(readings)}
+
 @app.post("/upload")
 def upload():
     device_id = request.args.get("id", "UNKNOWN")   # ?id=ESP32CAM-123 또는 ?id=ESP32-123
+    if device_id.startswith("ESP32"):
+        presence.seen(device_id)
     ct = request.content_type or ""
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     saved_path = None
+    info = {}
 
     try:
         # ==============================
@@ -219,53 +520,28 @@ def upload():
                     return jsonify({"status": "fail", "error": "form field 'file' not found"}), 400
                 file_storage = request.files["file"]
                 ext = os.path.splitext(file_storage.filename or "")[1] or ".jpg"
-                saved_path = os.path.join(UPLOAD_DIR, f"CAM_{timestamp}{ext}")
+                saved_path = cam_upload_path(device_id, ext)
                 file_storage.save(saved_path)
             else:
-                # 기본적으로 raw binary 데이터를 jpg로 저장
-                data = request.get_data()
-                saved_path = os.path.join(UPLOAD_DIR, f"CAM_{timestamp}.jpg")
-                with open(saved_path, "wb") as f:
-                    f.write(data)
+                # 기본적으로 raw binary 데이터를 jpg로 저장 (JPEG 헤더 확인 + 해시 계산하면서 스트리밍)
+                saved_path = cam_upload_path(device_id)
+                try:
+                    _, info["bytes"], info["hash"] = save_stream(request.stream.read, UPLOAD_DIR, saved_path,
+                                                                 max_bytes=MAX_UPLOAD_BYTES)
+                except Exception:
+                    discard_upload(saved_path)
+                    raise
 
-            insert_upload_log(saved_path)
-            print(f"[CAM 업로드] {saved_path}")
+            accept_cam_upload(device_id, saved_path, request.args.get("crop"), info.get("hash"))
 
         # ==============================
         # 2. ESP32 (센서 데이터 업로드)
         # ==============================
         elif device_id.startswith("ESP32"):
-            body = request.get_data(as_text=True)
-            saved_path = os.path.join(UPLOAD_DIR, f"ESP32_{timestamp}_sensor.txt")
-            with open(saved_path, "w", encoding="utf-8") as f:
-                f.write(body)
-
-            # (옵션) 센서 데이터 파싱
-            try:
-                lines = body.strip().split("\n")
-                temp = float(lines[0].split(":")[1].strip().replace("C", "").strip())
-                hum = float(lines[1].split(":")[1].strip().replace("%", "").strip())
-                soil = int(lines[2].split(":")[1].strip().replace("%", "").strip())
-                water = float(lines[3].split(":")[1].strip().replace("%", "").strip())
-                led = "OFF" if int(lines[4].split(":")[1].strip()) == 1 else "ON"
-                fan = "OFF" if int(lines[5].split(":")[1].strip()) == 1 else "ON"
-                
-
-                # 최신 센서값 메모리에 저장
-                latest_sensor_data["temperature"] = temp
-                latest_sensor_data["humidity"] = hum
-                latest_sensor_data["soil_moisture"] = soil
-                latest_sensor_data["water_level"] = water
-                latest_sensor_data["led_state"] = led
-                latest_sensor_data["fan_state"] = fan
-                latest_sensor_data["timestamp"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-                # ✅ 센서 전용 DB에 저장
-                insert_sensor_data(temp, hum, soil, water, led, fan)
-
-                print(f"[ESP32 센서 업로드] 온도:{temp}°C, 습도:{hum}%, 토양:{soil}, 수위:{water}%, LED:{led}, FAN:{fan}")
-            except Exception as e:
-                print(f"[ESP32 센서 파싱 오류] {e}")
+            # 본문 전체를 읽기 전에 크기 확인 (Content-Length가 없어도 MAX_SENSOR_BYTES + 1까지만 읽음)
+            if (request.content_length or 0) > MAX_SENSOR_BYTES:
+                raise BadUpload(f"sensor payload larger than {MAX_SENSOR_BYTES} bytes", status=413)
+            info = accept_sensor_upload(device_id, read_limited(request.stream.read, MAX_SENSOR_BYTES + 1))
 
         # ==============================
         # 3. 알 수 없는 장치
@@ -273,8 +549,11 @@ def upload():
         else:
             return jsonify({"status": "fail", "error": "unknown device"}), 400
 
-        return jsonify({"status": "ok", "saved": os.path.basename(saved_path) if saved_path else "sensor_data"}), 200
+        return jsonify({"status": "ok", "saved": upload_store.rel_path(saved_path) if saved_path else "sensor_data",
+                        **info}), 200
 
+    except BadUpload as e:
+        return jsonify({"status": "fail", "error": str(e)}), e.status
     except Exception as e:
         return jsonify({"status": "fail", "error": str(e)}), 500
 
@@ -282,64 +561,262 @@ def upload():
 # ===== API: 최신 센서 데이터 조회 =====
 @app.get("/api/sensor")
 def api_sensor():
-    """프론트엔드에서 실시간 센서 데이터 조회"""
+    """프론트엔드에서 실시간 센서 데이터 조회
+
+    ?device=ESP32-xxx : 해당 장치의 최신값
+    ?device=all       : 모든 장치의 최신값
+    (없으면)          : 가장 최근에 들어온 장치의 값
+    """
+    device_id = request.args.get("device")
+    if device_id == "all":
+        return jsonify({"ok": True, "data": sensor_state.all()})
+    data = sensor_state.get(device_id)
+    if data is None:
+        if device_id:
+            return jsonify({"ok": False, "error": f"no sensor data for {device_id}"}), 404
+        data = empty_state()
     return jsonify({
         "ok": True,
-        "data": latest_sensor_data
+        "data": data,
+        "devices": sensor_state.devices(),
     })
 
+# ===== API: 실시간 이벤트 스트림 (Server-Sent Events) =====
+@app.get("/api/events")
+def api_events():
+    """?device=ESP32-1,ESP32CAM-1 (장치별 토픽) &types=sensor,upload,diagnosis
+
+    이벤트 이름: sensor / upload / diagnosis, data는 JSON
+    재접속 시 브라우저가 보내는 Last-Event-ID 이후 이벤트를 이어서 보냄
+    """
+    devices = request.args.get("device")
+    types = request.args.get("types")
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_id")
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+    stream = events.stream(set(devices.split(",")) if devices else None,
+                           set(types.split(",")) if types else None,
+                           last_id)
+    return Response(stream, mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/events/stats")
+def api_events_stats():
+    return jsonify({"ok": True, "events": events.stats()})
+
+# ===== API: 장치 접속 상태 =====
+@app.get("/api/devices")
+def api_devices():
+    """?status=Online 이면 접속 중인 장치만"""
+    status = request.args.get("status")
+    return jsonify({"ok": True, "devices": presence.devices(status), "stats": presence.stats()})
+
+# ===== API: 센서 기록 조회 =====
+@app.get("/api/sensor/history")
+def api_sensor_history():
+    """?from=&to=(epoch 초 또는 ISO 시간)&resolution=raw|1m|1h|1d|auto&device=
+
+    기본값: 최근 24시간, resolution=auto (기간에 맞춰 롤업 선택)
+    """
+    now = int(time.time())
+    try:
+        end = parse_time(request.args.get("to"), now)
+        start = parse_time(request.args.get("from"), end - 86400)
+        resolution, points = sensor_ts.query(start, end,
+                                             request.args.get("resolution", "auto"),
+                                             request.args.get("device"))
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    return jsonify({"ok": True, "from": start, "to": end, "resolution": resolution, "points": points})
+
 # ===== ESP32: 식물 생장 단계 조회 =====
+PLANT_LEVEL = "300"  # 임시 값
+
 @app.get("/level")
 def plant_level():
     """ESP32에서 식물 생장 단계를 요청하면 반환 (임시로 300 반환)"""
-    return Response("300", mimetype="text/plain")
+    return Response(PLANT_LEVEL, mimetype="text/plain")
+
+TRIGGER_LABELS = {"ESP32CAM": "CAM", "ESP32": "ESP32"}
+
+def push_trigger(kind, device_id=None):
+    """device_id가 있으면 그 장치에만, 없으면 먼저 폴링한 {kind} 장치에 전달 -> (응답 dict, 상태 코드)"""
+    if device_id:
+        if device_kind(device_id) != kind:
+            return {"status": "fail", "error": f"not a {kind} device: {device_id}"}, 400
+        commands.push(device_id)
+        target = device_id
+    else:
+        commands.push_kind(kind)
+        target = kind
+    return {"status": "ok", "target": target,
+            "message": f"다음 GET 시 {TRIGGER_LABELS[kind]}에 201 반환 예정"}, 200
+
+def trigger(kind):
+    body, status = push_trigger(kind, request.args.get("id"))
+    return jsonify(body), status
 
 @app.get("/trigger/cam")
 def trigger_cam():
-    flags["cam_pending"] = True
-    return jsonify({"status": "ok", "message": "다음 GET 시 CAM에 201 반환 예정"})
+    return trigger("ESP32CAM")
 
 @app.get("/trigger/esp32")
 def trigger_esp32():
-    flags["esp32_pending"] = True
-    return jsonify({"status": "ok", "message": "다음 GET 시 ESP32에 201 반환 예정"})
+    return trigger("ESP32")
+
+@app.get("/api/commands")
+def api_commands():
+    """대기 중인 명령 / 롱 폴링 중인 장치 수 / 전달 지연"""
+    return jsonify({"ok": True, "pending": commands.pending(), "stats": commands.stats()})
+
+# ===== 업로드 목록 조회 (키셋 페이지네이션) =====
+# OFFSET 대신 "이전 페이지 마지막 id보다 작은 것"을 인덱스로 바로 찾으므로
+# 쌓인 업로드 수와 상관없이 페이지 하나 조회 비용이 같다
+UPLOADS_PAGE_SIZE = 50
+UPLOADS_PAGE_MAX = 200
+GALLERY_PAGE_SIZE = 30
+
+def upload_filters(args, default_limit):
+    """?cursor=&device=&from=YYYY-MM-DD&to=YYYY-MM-DD&limit= -> query_uploads 인자 (잘못된 값은 ValueError)"""
+    filters = {
+        "cursor": int(args["cursor"]) if args.get("cursor") else None,
+        "device_id": args.get("device") or None,
+        "date_from": None,
+        "date_to": None,
+        "limit": min(max(int(args.get("limit", default_limit)), 1), UPLOADS_PAGE_MAX),
+    }
+    if args.get("from"):
+        filters["date_from"] = datetime.date.fromisoformat(args["from"])
+    if args.get("to"):
+        filters["date_to"] = datetime.date.fromisoformat(args["to"])
+    return filters
+
+def query_uploads(cursor=None, device_id=None, date_from=None, date_to=None, limit=UPLOADS_PAGE_SIZE):
+    """업로드 한 페이지 (최신순) -> (행 목록, 다음 페이지 cursor 또는 None)"""
+    where, params = [], []
+    if cursor:
+        where.append("id < ?")
+        params.append(cursor)
+    if device_id:
+        where.append("device_id = ?")
+        params.append(device_id)
+    if date_from:
+        where.append("timestamp >= ?")
+        params.append(date_from.isoformat())
+    if date_to:  # to 날짜 당일까지 포함
+        where.append("timestamp < ?")
+        params.append((date_to + datetime.timedelta(days=1)).isoformat())
+    rows = cam_db.query(f"""
+        SELECT id, file_path, rel_path, device_id, timestamp, crop, disease_code, disease_name, confidence, diagnosed_at
+        FROM uploads {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY id DESC LIMIT ?
+    """, params + [limit + 1])
+    next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def upload_to_dict(row):
+    upload_id, file_path, rel_path, device_id, timestamp, crop, code, name, conf, diagnosed_at = row
+    return {
+        "id": upload_id,
+        "filename": os.path.basename(file_path),
+        "url": upload_store.url(file_path, rel_path),
+        "thumb_url": upload_store.url(file_path, rel_path) + "?size=thumb",
+        "device_id": device_id,
+        "timestamp": timestamp,
+        # 아직 진단 전이면 None
+        "diagnosis": {
+            "crop": crop,
+            "disease_code": code,
+            "disease_name": name,
+            "confidence": conf,
+            "diagnosed_at": diagnosed_at,
+        } if diagnosed_at else None
+    }
 
 # ===== 프론트: 갤러리 페이지 =====
 @app.get("/gallery")
 def gallery():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT file_path, timestamp FROM uploads ORDER BY id DESC")
-    rows = cur.fetchall()
-    conn.close()
-    return render_template("gallery.html", rows=rows)
+    """한 페이지(GALLERY_PAGE_SIZE장)만 렌더링, ?cursor= 로 다음 페이지"""
+    try:
+        filters = upload_filters(request.args, GALLERY_PAGE_SIZE)
+    except ValueError:
+        return "잘못된 조회 조건입니다", 400
+    rows, next_cursor = query_uploads(**filters)
+    return render_template("gallery.html",
+                           uploads=[upload_to_dict(r) for r in rows],
+                           next_cursor=next_cursor,
+                           device=filters["device_id"] or "",
+                           date_from=request.args.get("from", ""),
+                           date_to=request.args.get("to", ""))
 
 # ===== 업로드 파일 서빙 =====
 @app.get("/uploads/<path:filename>")
 def uploaded_file(filename):
-    return send_from_directory(UPLOAD_DIR, filename)
+    """filename: YYYY/MM/DD/... 상대 경로 (예전 업로드는 파일 이름만)
+
+    ?size=thumb : 갤러리용 썸네일, ?size=224 : 모델 입력 크기 (없으면 그 자리에서 만듦, 실패 시 원본)
+    """
+    return send_upload(filename, request.args.get("size"))
+
+UPLOAD_MAX_AGE = 86400  # 업로드 파일은 이름이 겹치지 않으므로 하루 캐시 후 ETag로 재확인
+
+def send_upload(filename, size=None):
+    """업로드 파일 전송 (강한 ETag + 조건부 GET/Range 지원)"""
+    path = safe_join(UPLOAD_DIR, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    if size:
+        path = find_variant(path, size) or path
+    st = os.stat(path)
+    # 저장 후 내용이 바뀌지 않는 파일이라 크기+수정 시각(ns)이 같으면 같은 bytes
+    etag = f"{st.st_size:x}-{st.st_mtime_ns:x}"
+    return send_file(path, etag=etag, last_modified=st.st_mtime, max_age=UPLOAD_MAX_AGE, conditional=True)
+
+@app.get("/uploads/id/<int:upload_id>")
+def uploaded_file_by_id(upload_id):
+    """업로드 ID -> 파일"""
+    row = cam_db.query_one("SELECT file_path, rel_path FROM uploads WHERE id = ?", (upload_id,))
+    if row is None:
+        return jsonify({"ok": False, "error": "upload not found"}), 404
+    file_path, rel_path = row
+    return send_upload(rel_path or os.path.basename(file_path), request.args.get("size"))
 
 # ===== API: 최근 업로드 이미지 목록 =====
 @app.get("/api/uploads")
 def api_uploads():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT file_path, timestamp FROM uploads ORDER BY id DESC LIMIT 50")
-    rows = cur.fetchall()
-    conn.close()
-    
-    uploads = []
-    for file_path, timestamp in rows:
-        filename = os.path.basename(file_path)
-        uploads.append({
-            "filename": filename,
-            "url": f"/uploads/{filename}",
-            "timestamp": timestamp
-        })
-    
-    return jsonify({"ok": True, "uploads": uploads})
-
-if __name__ == "__main__":
+    """?cursor=(이전 응답의 next_cursor)&device=&from=&to=&limit= (기본 50, 최대 200)"""
+    try:
+        filters = upload_filters(request.args, UPLOADS_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    rows, next_cursor = query_uploads(**filters)
+    return jsonify({"ok": True, "uploads": [upload_to_dict(r) for r in rows], "next_cursor": next_cursor})
+
+def startup_report():
+    """워커 시작 소요 시간 출력 (import / 모델 로드 / 전체)"""
+    t = time.perf_counter()
+    if proc_pool is None:
+        registry.preload(PRELOAD_CROPS)
+    preload_s = time.perf_counter() - t
+    print(f"[시작 시간] import {STARTUP_IMPORT_S:.3f}s, 모델 미리 로드 {preload_s:.3f}s "
+          f"({', '.join(PRELOAD_CROPS) or '없음'}), 전체 {time.perf_counter() - STARTUP_T0:.3f}s")
+    for crop, times in registry.stats()["load_times"].items():
+        print(f"  - {crop}: {times}")
+
+def startup():
+    """DB 초기화 + 백그라운드 작업 시작 (Flask 실행과 gateway.py 둘 다 사용)"""
+    static_index.build()
     init_db()          # 기존 cam_server.db 초기화
     init_sensor_db()   # ✅ sensor_server.db 초기화
-    app.run(host="0.0.0.0", port=15020, debug=False)
+    sensor_state.load(sensor_db)
+    presence.load(cam_db)
+    presence.start()
+    retention.start()
+    startup_report()
+
+if __name__ == "__main__":
+    startup()
+    # SSE 연결이 스레드를 하나씩 잡고 있으므로 요청별 스레드 사용
+    app.run(host="0.0.0.0", port=15020, debug=False, threaded=True)
@@ -0,0 +1,148 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+import torch
+
+from preprocess import normalize_into
+
+
+class BatchInferenceQueue:
+    """/api/predict 요청을 모아서 한 번의 배치 forward로 처리하는 큐
+
+    요청 스레드는 submit()으로 (3,224,224) 텐서를 넣고 Future를 받는다.
+    uint8 텐서(preprocess.decode_image 결과)를 넣으면 정규화는 배치 단위로 한 번에 한다.
+    워커 스레드는 첫 요청이 들어온 뒤 max_wait_ms 동안(또는 max_batch개가 찰 때까지)
+    요청을 모아 model에 한 번에 넣고, 결과 확률을 각 Future에 돌려준다.
+    """
+
+    def __init__(self, model, device, max_batch=16, max_wait_ms=10):
+        self.model = model
+        self.device = device
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._q = queue.Queue()
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._buf = None  # 재사용하는 (max_batch, 3, H, W) float 배치 텐서
+
+        # 튜닝용 통계: 배치 크기별 횟수, 처리한 요청 수
+        self.batch_hist = {}
+        self.total_requests = 0
+        self.total_batches = 0
+
+        self._thread = threading.Thread(target=self._loop, name="batch-infer", daemon=True)
+        self._thread.start()
+
+    def submit(self, x):
+        """전처리된 단일 이미지 텐서를 넣고 softmax 확률을 돌려줄 Future 반환"""
+        fut = Future()
+        if self._stopped:
+            fut.set_exception(RuntimeError("batch queue stopped"))
+            return fut
+        self._q.put((x, fut))
+        return fut
+
+    def predict(self, x, timeout=None):
+        """submit() 후 결과가 나올 때까지 대기"""
+        return self.submit(x).result(timeout=timeout)
+
+    def stop(self, wait=True):
+        """이미 들어온 요청까지 처리한 뒤 워커 종료 (이후 submit은 실패)"""
+        self._stopped = True
+        self._q.put(None)
+        if wait:
+            self._thread.join(timeout=5)
+
+    @property
+    def stopped(self):
+        return self._stopped
+
+    def stats(self):
+        with self._lock:
+            hist = dict(sorted(self.batch_hist.items()))
+            total_req = self.total_requests
+            total_batches = self.total_batches
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+            "pending": self._q.qsize(),
+            "requests": total_req,
+            "batches": total_batches,
+            "avg_batch": round(total_req / total_batches, 3) if total_batches else 0.0,
+            "batch_size_hist": hist,
+        }
+
+    # ===== 내부 워커 =====
+    def _collect(self):
+        """첫 요청을 블로킹으로 받고, 마감 시각까지 추가 요청을 모은다"""
+        first = self._q.get()
+        if first is None:
+            return None
+        items = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < self.max_batch:
+            remain = deadline - time.monotonic()
+            if remain <= 0:
+                break
+            try:
+                item = self._q.get(timeout=remain)
+            except queue.Empty:
+                break
+            if item is None:
+                self._stopped = True
+                break
+            items.append(item)
+        return items
+
+    def _loop(self):
+        while True:
+            items = self._collect()
+            if items is None:
+                break
+            # 이미 취소된 요청은 버린다
+            items = [(x, fut) for x, fut in items if fut.set_running_or_notify_cancel()]
+            if items:
+                self._run_batch(items)
+            if self._stopped and self._q.empty():
+                break
+
+        # 종료 시 남은 요청은 실패 처리
+        while True:
+            try:
+                item = self._q.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(RuntimeError("batch queue stopped"))
+
+    def _run_batch(self, items):
+        try:
+            batch = self._make_batch([x for x, _ in items])
+            with torch.no_grad():
+                prob = torch.softmax(self.model(batch), dim=1)
+        except Exception as e:
+            for _, fut in items:
+                fut.set_exception(e)
+            return
+
+        for i, (_, fut) in enumerate(items):
+            fut.set_result(prob[i])
+
+        n = len(items)
+        with self._lock:
+            self.batch_hist[n] = self.batch_hist.get(n, 0) + 1
+            self.total_requests += n
+            self.total_batches += 1
+
+    def _make_batch(self, xs):
+        shape = (self.max_batch,) + tuple(xs[0].shape)
+        if self._buf is None or tuple(self._buf.shape) != shape:
+            self._buf = torch.empty(shape, dtype=torch.float32, device=self.device)
+        if xs[0].dtype == torch.uint8:
+            return normalize_into(self._buf, xs)
+        batch = self._buf[:len(xs)]
+        for i, x in enumerate(xs):
+            batch[i].copy_(x)
+        return batch
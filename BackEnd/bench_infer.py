@@ -0,0 +1,96 @@
+"""멀티 프로세스 추론 처리량 측정 (워커 1개 ~ N개)
+
+사용 예:
+    python bench_infer.py                       # 랜덤 가중치 모델로 1..CPU수 측정
+    python bench_infer.py --max-procs 4 --images 200
+    python bench_infer.py --model-dir /home/student_15020 --crop lettuce
+
+--model-dir 를 주지 않으면 임시 폴더에 랜덤 가중치 full 체크포인트를 만들어서 측정한다
+(정확도와 무관하게 연산량은 실제 모델과 같음).
+"""
+import io
+import os
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+from PIL import Image
+
+from model_registry import build_model
+from proc_pool import ProcessInferencePool
+
+
+def make_jpeg(width, height, seed):
+    """ESP32-CAM 프레임 크기의 테스트 JPEG"""
+    rng = np.random.default_rng(seed)
+    arr = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(arr).save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
+
+
+def make_dummy_model(model_dir, crop):
+    class_ids = ['0', '1', '2']
+    torch.save({
+        "model_state_dict": build_model(len(class_ids)).state_dict(),
+        "disease_to_idx": {c: i for i, c in enumerate(class_ids)},
+        "class_names": class_ids,
+        "disease_names": {c: c for c in class_ids},
+    }, os.path.join(model_dir, f"{crop}_disease_model_full.pth"))
+
+
+def run(model_dir, crop, procs, images, concurrency, max_batch):
+    pool = ProcessInferencePool(model_dir, num_procs=procs, preload=[crop], max_batch=max_batch)
+    try:
+        # 워밍업 (모델 로드 + 첫 추론)
+        for fut in [pool.submit(crop, images[0]) for _ in range(procs * 2)]:
+            fut.result()
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as ex:
+            list(ex.map(lambda data: pool.predict(crop, data), images))
+        elapsed = time.perf_counter() - t0
+    finally:
+        pool.stop()
+    return len(images) / elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser(description="프로세스 수별 추론 처리량 측정")
+    ap.add_argument("--model-dir", default=None)
+    ap.add_argument("--crop", default="bench")
+    ap.add_argument("--max-procs", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--images", type=int, default=100)
+    ap.add_argument("--concurrency", type=int, default=32, help="동시에 요청하는 클라이언트 수")
+    ap.add_argument("--max-batch", type=int, default=8)
+    ap.add_argument("--width", type=int, default=1600)
+    ap.add_argument("--height", type=int, default=1200)
+    args = ap.parse_args()
+
+    tmp = None
+    model_dir = args.model_dir
+    if model_dir is None:
+        tmp = tempfile.TemporaryDirectory()
+        model_dir = tmp.name
+        make_dummy_model(model_dir, args.crop)
+
+    # 서로 다른 이미지를 써서 예측 캐시 등의 영향 없이 측정
+    frames = [make_jpeg(args.width, args.height, seed) for seed in range(8)]
+    images = [frames[i % len(frames)] for i in range(args.images)]
+
+    print(f"이미지 {args.images}장 ({args.width}x{args.height} JPEG), 동시 요청 {args.concurrency}")
+    print(f"{'procs':>5} {'img/s':>8} {'scaling':>8}")
+    base = None
+    for n in range(1, args.max_procs + 1):
+        ips = run(model_dir, args.crop, n, images, args.concurrency, args.max_batch)
+        base = base or ips
+        print(f"{n:>5} {ips:>8.2f} {ips / base:>7.2f}x")
+
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
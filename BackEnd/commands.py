@@ -0,0 +1,141 @@
+import time
+import asyncio
+import threading
+from collections import deque
+
+CMD_RUN = "201"   # 장치가 작업(촬영/센서 전송)을 하도록 하는 응답
+CMD_IDLE = "200"  # 할 일 없음
+
+
+def device_kind(device_id):
+    """장치 ID -> 종류 (ESP32CAM-001 -> ESP32CAM, ESP32-001 -> ESP32)"""
+    if device_id.startswith("ESP32CAM"):
+        return "ESP32CAM"
+    if device_id.startswith("ESP32"):
+        return "ESP32"
+    return None
+
+
+class CommandHub:
+    """장치별 명령 큐 + 롱 폴링
+
+    - push(device_id): 해당 장치에게만 전달 (/trigger/cam?id=ESP32CAM-001)
+    - push_kind(kind): 그 종류 장치 중 먼저 폴링한 하나에게 전달 (기존 flags 동작)
+    - wait(device_id, timeout): 명령이 생기거나 timeout이 지날 때까지 대기
+    - wait_async(...): asyncio 서버용 (스레드를 잡지 않고 대기)
+    같은 명령이 이미 대기 중이면 다시 넣지 않는다 (기존 bool flag처럼 여러 번 눌러도 한 번 실행).
+    """
+
+    def __init__(self):
+        self._queues = {}    # device_id 또는 "*종류" -> deque[(command, pushed_at)]
+        self._waiters = {}   # device_id -> set(깨우는 함수)
+        self._lock = threading.Lock()
+        self.pushed = 0
+        self.delivered = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def push(self, device_id, command=CMD_RUN):
+        return self._push(device_id, command, lambda d: d == device_id)
+
+    def push_kind(self, kind, command=CMD_RUN):
+        return self._push("*" + kind, command, lambda d: device_kind(d) == kind)
+
+    def _push(self, key, command, match):
+        with self._lock:
+            q = self._queues.setdefault(key, deque())
+            if any(c == command for c, _ in q):
+                return False
+            q.append((command, time.monotonic()))
+            self.pushed += 1
+            wake = [w for d, ws in self._waiters.items() if match(d) for w in ws]
+        for w in wake:
+            w()
+        return True
+
+    def take(self, device_id):
+        """대기 중인 명령 하나 꺼내기 (장치 지정 명령 먼저, 없으면 종류 공통 명령)"""
+        with self._lock:
+            for key in (device_id, "*" + str(device_kind(device_id))):
+                q = self._queues.get(key)
+                if q:
+                    command, pushed_at = q.popleft()
+                    latency = time.monotonic() - pushed_at
+                    self.delivered += 1
+                    self.total_latency += latency
+                    self.max_latency = max(self.max_latency, latency)
+                    return command
+        return None
+
+    def _add_waiter(self, device_id, wake):
+        with self._lock:
+            self._waiters.setdefault(device_id, set()).add(wake)
+
+    def _remove_waiter(self, device_id, wake):
+        with self._lock:
+            ws = self._waiters.get(device_id)
+            if ws is not None:
+                ws.discard(wake)
+                if not ws:
+                    del self._waiters[device_id]
+
+    def wait(self, device_id, timeout):
+        """명령이 오면 바로 반환, timeout(초) 동안 없으면 None"""
+        command = self.take(device_id)
+        if command is not None or timeout <= 0:
+            return command
+        event = threading.Event()
+        self._add_waiter(device_id, event.set)
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                # 등록 직전에 들어온 명령도 놓치지 않도록 다시 확인
+                command = self.take(device_id)
+                remain = deadline - time.monotonic()
+                if command is not None or remain <= 0:
+                    return command
+                event.wait(remain)
+                event.clear()
+        finally:
+            self._remove_waiter(device_id, event.set)
+
+    async def wait_async(self, device_id, timeout):
+        command = self.take(device_id)
+        if command is not None or timeout <= 0:
+            return command
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+
+        def wake():
+            loop.call_soon_threadsafe(event.set)
+
+        self._add_waiter(device_id, wake)
+        deadline = loop.time() + timeout
+        try:
+            while True:
+                command = self.take(device_id)
+                remain = deadline - loop.time()
+                if command is not None or remain <= 0:
+                    return command
+                try:
+                    await asyncio.wait_for(event.wait(), remain)
+                except asyncio.TimeoutError:
+                    pass
+                event.clear()
+        finally:
+            self._remove_waiter(device_id, wake)
+
+    def pending(self):
+        with self._lock:
+            return {k: [c for c, _ in q] for k, q in self._queues.items() if q}
+
+    def stats(self):
+        with self._lock:
+            waiting = sum(len(ws) for ws in self._waiters.values())
+            return {
+                "pushed": self.pushed,
+                "delivered": self.delivered,
+                "waiting": waiting,
+                "avg_latency_ms": round(self.total_latency / self.delivered * 1000, 2) if self.delivered else 0.0,
+                "max_latency_ms": round(self.max_latency * 1000, 2),
+            }
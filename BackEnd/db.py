@@ -0,0 +1,325 @@
+import time
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class Database:
+    """SQLite 연결 풀
+
+    매번 connect/close 하지 않고 만들어 둔 연결을 빌려 쓰고 돌려준다.
+    (Flask 개발 서버는 요청마다 새 스레드를 만들기 때문에 스레드별 연결이 아니라 풀로 관리)
+    - journal_mode=WAL : 읽기와 쓰기가 서로 막지 않음
+    - synchronous=NORMAL : WAL에서는 커밋마다 fsync 하지 않아도 DB가 깨지지 않음
+    - busy_timeout : 다른 연결이 쓰는 중이면 바로 실패하지 않고 기다림
+    - cached_statements : 연결마다 같은 SQL 문자열은 컴파일된 statement를 재사용
+    - auto_vacuum=INCREMENTAL : 새 DB는 삭제 후 빈 페이지를 incremental_vacuum으로 조금씩 반환
+      (테이블이 이미 있는 DB는 VACUUM 한 번이 필요, 서버를 멈추고 python retention.py convert)
+    """
+
+    def __init__(self, path, pool_size=8, synchronous="NORMAL", busy_timeout_ms=5000, cached_statements=256,
+                 auto_vacuum="INCREMENTAL"):
+        self.path = path
+        self.pool_size = pool_size
+        self.synchronous = synchronous
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self.auto_vacuum = auto_vacuum
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _new_conn(self):
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000,
+                               cached_statements=self.cached_statements,
+                               check_same_thread=False)
+        # 테이블 생성 전(빈 DB)에만 적용되므로 가장 먼저 설정
+        conn.execute(f"PRAGMA auto_vacuum={self.auto_vacuum}")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.pool_size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._new_conn()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        # 풀이 꽉 찼으면 다른 요청이 반납할 때까지 대기
+        return self._idle.get()
+
+    @contextmanager
+    def connection(self):
+        """with db.connection() as conn: ... (읽기용, 커밋 없음)"""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        """with db.transaction() as conn: ... -> 정상 종료 시 commit, 예외 시 rollback"""
+        with self.connection() as conn:
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def execute(self, sql, params=()):
+        """쓰기 한 건 실행 후 커밋, lastrowid 반환"""
+        with self.transaction() as conn:
+            return conn.execute(sql, params).lastrowid
+
+    def executemany(self, sql, rows):
+        with self.transaction() as conn:
+            conn.executemany(sql, rows)
+
+    def query(self, sql, params=()):
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def query_one(self, sql, params=()):
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def stats(self):
+        return {"path": self.path, "pool_size": self.pool_size,
+                "open": self._created, "idle": self._idle.qsize()}
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+class WriteBehindBuffer:
+    """쓰기 지연 버퍼
+
+    add()는 메모리에 (sql, params)를 쌓기만 하고 바로 반환한다.
+    max_rows개가 쌓이거나 첫 행이 들어온 뒤 max_delay_ms가 지나면
+    백그라운드 스레드가 한 트랜잭션으로 기록한다 (연속된 같은 SQL은 executemany로 묶음).
+    추가된 순서대로 기록하므로 INSERT 뒤에 넣은 UPDATE도 순서가 보장된다.
+    add(..., after=함수)로 넘긴 함수는 그 행이 커밋된 뒤에 호출된다 (이벤트 알림 등, 조회하면 바로 보이도록).
+    DB 잠금 같은 일시적 오류(sqlite3.OperationalError)면 실패한 배치를 따로 보관했다가 retry_base_s, 2배, 4배...
+    (최대 retry_max_s) 뒤에 그 배치만 다시 시도한다 (그 사이 들어온 행은 다음 배치로).
+    max_attempts번 연속 실패한 배치만 버리고 dropped로 센다.
+    제약 위반 같은 그 밖의 오류면 한 행씩 따로 기록해서 실패한 행만 버린다.
+    """
+
+    def __init__(self, db, max_rows=500, max_delay_ms=1000, name="write-behind",
+                 max_attempts=8, retry_base_s=0.5, retry_max_s=30.0):
+        self.db = db
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000.0
+        self.max_attempts = max_attempts
+        self.retry_base_s = retry_base_s
+        self.retry_max_s = retry_max_s
+        self._rows = []
+        self._first_at = None
+        self._retry = None        # 재시도를 기다리는 (rows, first_at)
+        self._attempts = 0        # 그 배치가 연속으로 실패한 횟수
+        self._retry_at = None     # 이 시각(monotonic) 전에는 다시 시도하지 않음
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stopped = False
+
+        # 측정값: 플러시 횟수/행 수/배치 크기, 지연(첫 행이 들어온 뒤 기록까지 걸린 시간)
+        self.flushes = 0
+        self.rows_written = 0
+        self.last_batch = 0
+        self.max_batch = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.errors = 0
+        self.retries = 0
+        self.dropped = 0
+
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    def add(self, sql, params, after=None):
+        with self._cond:
+            first = self._first_at is None
+            if first:
+                self._first_at = time.monotonic()
+            self._rows.append((sql, params, after))
+            # 첫 행이면 타이머 시작, max_rows에 도달하면 바로 기록하도록 깨움
+            if first or len(self._rows) >= self.max_rows:
+                self._cond.notify()
+
+    def flush(self):
+        """쌓인 행을 지금 기록 (기록한 행 수 반환)"""
+        with self._flush_lock:
+            with self._cond:
+                if self._retry is not None:
+                    # 실패했던 배치만 다시 시도
+                    (rows, first_at), self._retry = self._retry, None
+                else:
+                    rows, self._rows = self._rows, []
+                    first_at, self._first_at = self._first_at, None
+            if not rows:
+                return 0
+
+            try:
+                self._write(rows)
+                written = rows
+            except sqlite3.OperationalError as e:
+                # DB 잠김/busy 등 일시적 오류 -> 배치 통째로 나중에 다시
+                self.errors += 1
+                self._retry_later(rows, first_at, e)
+                return 0
+            except Exception as e:
+                # 제약 위반 등 특정 행 문제 -> 한 행씩 기록해서 그 행만 버림
+                self.errors += 1
+                print(f"[DB 지연 기록 오류] {len(rows)}행 배치 실패, 한 행씩 다시 기록: {e}")
+                written = self._write_each(rows, first_at)
+                if not written:
+                    return 0
+
+            with self._cond:
+                if self._retry is None:
+                    self._attempts = 0
+                    self._retry_at = None
+            for _, _, after in written:
+                if after is not None:
+                    try:
+                        after()
+                    except Exception as e:
+                        print(f"[DB 지연 기록] 커밋 후 처리 오류: {e}")
+
+            lag_ms = (time.monotonic() - first_at) * 1000
+            self.flushes += 1
+            self.rows_written += len(written)
+            self.last_batch = len(written)
+            self.max_batch = max(self.max_batch, len(written))
+            self.last_lag_ms = round(lag_ms, 2)
+            self.max_lag_ms = round(max(self.max_lag_ms, lag_ms), 2)
+            return len(written)
+
+    def _write(self, rows):
+        # 연속된 같은 SQL끼리 묶어서 한 트랜잭션으로
+        groups = []
+        for sql, params, _ in rows:
+            if groups and groups[-1][0] == sql:
+                groups[-1][1].append(params)
+            else:
+                groups.append((sql, [params]))
+        with self.db.transaction() as conn:
+            for sql, params_list in groups:
+                conn.executemany(sql, params_list)
+
+    def _write_each(self, rows, first_at):
+        """한 행씩 따로 커밋, 기록된 행 목록 반환
+
+        실패한 행은 버리고 dropped로 센다. 중간에 일시적 오류가 나면 남은 행은 재시도로 넘긴다.
+        """
+        written = []
+        for i, (sql, params, after) in enumerate(rows):
+            try:
+                with self.db.transaction() as conn:
+                    conn.execute(sql, params)
+            except sqlite3.OperationalError as e:
+                self._retry_later(rows[i:], first_at, e)
+                break
+            except Exception as e:
+                with self._cond:
+                    self.dropped += 1
+                print(f"[DB 지연 기록 오류] 1행 버림: {e} ({sql.split()[0]} {params!r})")
+                continue
+            written.append((sql, params, after))
+        return written
+
+    def _retry_later(self, rows, first_at, error):
+        """실패한 배치를 재시도로 보관 (max_attempts번 실패하면 버림)"""
+        with self._cond:
+            self._attempts += 1
+            if self._attempts >= self.max_attempts:
+                self.dropped += len(rows)
+                self._attempts = 0
+                self._retry_at = None
+                print(f"[DB 지연 기록 오류] {len(rows)}행 {self.max_attempts}번 실패, 버림: {error}")
+                return
+            self.retries += 1
+            delay = min(self.retry_base_s * 2 ** (self._attempts - 1), self.retry_max_s)
+            self._retry = (rows, first_at)
+            self._retry_at = time.monotonic() + delay
+            print(f"[DB 지연 기록 오류] {len(rows)}행, {delay:.1f}초 후 다시 시도 "
+                  f"({self._attempts}/{self.max_attempts}): {error}")
+
+    def stop(self):
+        """남은 행을 모두 기록하고 종료 (실패하면 버릴 때까지 재시도)"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join(timeout=5)
+        while True:
+            self.flush()
+            with self._cond:
+                if not self._rows and self._retry is None:
+                    break
+                wait = max(0.0, (self._retry_at or 0) - time.monotonic()) if self._retry else 0.0
+            time.sleep(wait)
+
+    def stats(self):
+        with self._cond:
+            pending = len(self._rows) + (len(self._retry[0]) if self._retry else 0)
+        return {
+            "pending": pending,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "avg_batch": round(self.rows_written / self.flushes, 2) if self.flushes else 0.0,
+            "last_batch": self.last_batch,
+            "max_batch": self.max_batch,
+            "last_lag_ms": self.last_lag_ms,
+            "max_lag_ms": self.max_lag_ms,
+            "errors": self.errors,
+            "retries": self.retries,
+            "dropped": self.dropped,
+        }
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if self._retry_at is not None:
+                        # 실패 후 대기 중: 재시도 시각까지 기다림 (새 행은 재시도 배치 다음에 기록)
+                        remain = self._retry_at - time.monotonic()
+                        if remain <= 0:
+                            break
+                        self._cond.wait(remain)
+                        continue
+                    if len(self._rows) >= self.max_rows:
+                        break
+                    if self._first_at is not None:
+                        remain = self._first_at + self.max_delay - time.monotonic()
+                        if remain <= 0:
+                            break
+                        self._cond.wait(remain)
+                    else:
+                        self._cond.wait()
+                stopped = self._stopped
+            self.flush()
+            if stopped:
+                break
@@ -0,0 +1,66 @@
+import io
+import os
+
+from PIL import Image
+
+from preprocess import INPUT_SIZE
+
+THUMB_SIZE = 256  # 갤러리 썸네일 긴 변 (px)
+
+# 원본 옆에 같은 이름으로 저장: X.jpg -> X.thumb.jpg / X.224.png
+VARIANTS = {
+    "thumb": ".thumb.jpg",
+    "224": ".224.png",  # 모델 입력 그대로 (무손실이라 원본을 decode_image 한 것과 같은 픽셀)
+}
+
+
+def variant_path(path, size):
+    return os.path.splitext(path)[0] + VARIANTS[size]
+
+
+def _write_atomic(path, data):
+    tmp = path + ".part"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def make_derivatives(path):
+    """원본 사진 -> 썸네일 + 224 변형 저장, 224 변형 PNG bytes 반환
+
+    원본은 preprocess.decode_image와 같은 방식으로 한 번만 디코딩한다
+    (JPEG draft로 224 이상인 가장 작은 크기까지 DCT 단계에서 축소).
+    그 결과의 긴 변이 THUMB_SIZE보다 크므로 썸네일도 같은 이미지에서 만든다.
+    """
+    img = Image.open(path)
+    if img.format == "JPEG":
+        img.draft("RGB", (INPUT_SIZE, INPUT_SIZE))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    thumb = img.copy()
+    thumb.thumbnail((THUMB_SIZE, THUMB_SIZE), Image.BILINEAR)
+    buf = io.BytesIO()
+    thumb.save(buf, format="JPEG", quality=80, optimize=True)
+    _write_atomic(variant_path(path, "thumb"), buf.getvalue())
+
+    if img.size != (INPUT_SIZE, INPUT_SIZE):
+        img = img.resize((INPUT_SIZE, INPUT_SIZE), Image.BILINEAR)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", compress_level=1)
+    data = buf.getvalue()
+    _write_atomic(variant_path(path, "224"), data)
+    return data
+
+
+def find_variant(path, size):
+    """size 변형 경로 (없으면 이 자리에서 만듦, 만들 수 없으면 None)"""
+    if size not in VARIANTS:
+        return None
+    vpath = variant_path(path, size)
+    if not os.path.exists(vpath):
+        try:
+            make_derivatives(path)
+        except Exception:
+            return None
+    return vpath
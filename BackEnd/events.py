@@ -0,0 +1,133 @@
+import json
+import queue
+import asyncio
+import threading
+from collections import deque
+
+
+class Subscriber:
+    def __init__(self, devices, types, max_queue):
+        self.devices = devices      # None 이면 모든 장치
+        self.types = types          # None 이면 모든 이벤트 종류
+        self.queue = queue.Queue(max_queue)
+        self.dropped = 0
+        self.wake = None            # asyncio 구독자: 이벤트가 들어오면 루프를 깨우는 함수
+
+    def wants(self, event):
+        if self.types is not None and event["type"] not in self.types:
+            return False
+        if self.devices is not None and event["device_id"] not in self.devices:
+            return False
+        return True
+
+
+def format_event(event):
+    payload = json.dumps({"device_id": event["device_id"], **event["data"]}, ensure_ascii=False)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {payload}\n\n"
+
+
+class EventBroker:
+    """Server-Sent Events 브로커 (장치별 토픽)
+
+    업로드/센서/진단 처리 쪽에서 publish()를 부르면 구독 중인 대시보드들에
+    바로 전달된다. 구독자마다 큐를 따로 두고 put_nowait만 하므로 느린 클라이언트가
+    있어도 publish 하는 요청 스레드는 막히지 않는다 (큐가 꽉 차면 그 구독자만 버림).
+    최근 history개 이벤트는 보관해서 재접속 시 Last-Event-ID 이후 것을 다시 보낸다.
+    stream()은 연결마다 스레드 하나를 잡고, stream_async()는 asyncio 서버(gateway.py)용으로 스레드 없이 대기.
+    """
+
+    def __init__(self, max_queue=256, history=512, keepalive_s=15):
+        self.max_queue = max_queue
+        self.keepalive_s = keepalive_s
+        self._subs = set()
+        self._history = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, type, device_id, data):
+        with self._lock:
+            event = {"id": self._next_id, "type": type, "device_id": device_id, "data": data}
+            self._next_id += 1
+            self._history.append(event)
+            subs = list(self._subs)
+            self.published += 1
+        for sub in subs:
+            if sub.wants(event):
+                try:
+                    sub.queue.put_nowait(event)
+                except queue.Full:
+                    sub.dropped += 1
+                    with self._lock:
+                        self.dropped += 1
+                    continue
+                if sub.wake is not None:
+                    sub.wake()
+        return event["id"]
+
+    def subscribe(self, devices=None, types=None, last_id=None, wake=None):
+        sub = Subscriber(devices, types, self.max_queue)
+        sub.wake = wake
+        with self._lock:
+            self._subs.add(sub)
+            backlog = [e for e in self._history if last_id is not None and e["id"] > last_id]
+        for event in backlog:
+            if sub.wants(event):
+                try:
+                    sub.queue.put_nowait(event)
+                except queue.Full:
+                    break
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subs.discard(sub)
+
+    def stream(self, devices=None, types=None, last_id=None):
+        """text/event-stream 응답 본문 생성기 (클라이언트가 끊으면 구독 해제)"""
+        sub = self.subscribe(devices, types, last_id)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = sub.queue.get(timeout=self.keepalive_s)
+                except queue.Empty:
+                    # 프록시/브라우저가 연결을 끊지 않도록 주석 한 줄 전송
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_event(event)
+        finally:
+            self.unsubscribe(sub)
+
+    async def stream_async(self, devices=None, types=None, last_id=None):
+        """stream()과 같은 본문을 async generator로 (대기 중에는 코루틴만 차지)"""
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        sub = self.subscribe(devices, types, last_id, wake=lambda: loop.call_soon_threadsafe(ready.set))
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = sub.queue.get_nowait()
+                except queue.Empty:
+                    ready.clear()
+                    if not sub.queue.empty():  # clear 직전에 들어온 이벤트
+                        continue
+                    try:
+                        await asyncio.wait_for(ready.wait(), self.keepalive_s)
+                    except asyncio.TimeoutError:
+                        yield ": keepalive\n\n"
+                    continue
+                yield format_event(event)
+        finally:
+            self.unsubscribe(sub)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": len(self._subs),
+                "published": self.published,
+                "dropped": self.dropped,
+                "last_id": self._next_id - 1,
+            }
@@ -0,0 +1,160 @@
+"""학습된 체크포인트를 서빙용 TorchScript / ONNX 파일로 변환
+
+사용 예:
+    python export_model.py --crop tomato --checkpoint best_tomato_disease_model.pth
+    python export_model.py --crop pepper --checkpoint pepper_disease_model_full.pth --out /home/student_15020
+
+결과 (--out 폴더):
+    {crop}_disease_model.ts.pt  (trace + freeze)
+    {crop}_disease_model.onnx
+    {crop}_disease_model.json   (클래스 정보, 원본 체크포인트, 정합성 검사 결과)
+
+변환 후 저장한 파일을 다시 읽어서 eager 모델과 같은 입력으로 출력을 비교하고,
+다시 읽을 수 없거나 차이가 허용치를 넘으면 그 파일을 지우고 실패 처리한다.
+한 형식의 변환이 실패해도(onnxscript 미설치 등) 나머지는 계속하고 메타는 항상 기록한다.
+"""
+import os
+import sys
+import json
+import inspect
+import argparse
+
+import torch
+
+from model_registry import KNOWN_CLASSES, build_model, load_checkpoint
+from infer_backend import artifact_paths, ort, OnnxRunner
+
+PARITY_ATOL = {"torchscript": 1e-4, "onnx": 1e-3}  # softmax 확률 기준 최대 허용 오차
+
+
+def export_torchscript(model, example, path):
+    # optimize_for_inference는 저장하면 버전에 따라 torch.jit.load가 실패하는 그래프를 만들어서 freeze까지만
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example)
+        frozen = torch.jit.freeze(traced.eval())
+    frozen.save(path)
+
+
+def export_onnx(model, example, path, opset=17):
+    kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # 새 torch는 dynamo exporter가 기본이고 onnxscript가 필요함 -> 기존 TorchScript 기반 exporter 사용
+        kwargs["dynamo"] = False
+    torch.onnx.export(
+        model, example, path,
+        input_names=["input"], output_names=["logits"],
+        dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=opset,
+        do_constant_folding=True,
+        **kwargs,
+    )
+
+
+def try_export(name, export, path):
+    """export() 실행, 실패하면 반쯤 쓴 파일을 지우고 {"error"} 반환 (성공하면 None)"""
+    try:
+        export()
+        return None
+    except Exception as e:
+        if os.path.exists(path):
+            os.remove(path)
+        print(f"[{name}] 변환 실패: {type(e).__name__}: {e}")
+        return {"error": f"export failed: {type(e).__name__}: {e}"}
+
+
+def parity(reference, runner, batch):
+    """eager 모델과 변환 모델의 softmax 확률 최대 차이 + top-1 일치 여부"""
+    with torch.no_grad():
+        ref = torch.softmax(reference(batch), dim=1)
+        out = torch.softmax(runner(batch), dim=1)
+    return {
+        "max_abs_diff": float((ref - out).abs().max().item()),
+        "top1_match": bool((ref.argmax(1) == out.argmax(1)).all().item()),
+    }
+
+
+def check_saved(reference, load, batch):
+    """저장된 파일을 load()로 다시 읽어서 parity (읽기/실행이 실패하면 error)"""
+    try:
+        runner = load()
+        if hasattr(runner, "eval"):
+            runner.eval()
+        return parity(reference, runner, batch)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="체크포인트 -> TorchScript/ONNX 변환")
+    ap.add_argument("--crop", required=True, help="작물 이름 (lettuce, tomato, strawberry, pepper ...)")
+    ap.add_argument("--checkpoint", required=True, help="best_*.pth 또는 *_disease_model_full.pth")
+    ap.add_argument("--out", default=None, help="결과 폴더 (기본: 체크포인트와 같은 폴더)")
+    ap.add_argument("--classes", default=None, help="state_dict 파일용 클래스 코드 (예: 0,18,19)")
+    ap.add_argument("--skip-onnx", action="store_true")
+    ap.add_argument("--opset", type=int, default=17)
+    args = ap.parse_args()
+
+    device = torch.device("cpu")
+    out_dir = args.out or os.path.dirname(os.path.abspath(args.checkpoint))
+    os.makedirs(out_dir, exist_ok=True)
+
+    class_ids, class_names = KNOWN_CLASSES.get(args.crop, (None, None))
+    if args.classes:
+        class_ids = args.classes.split(",")
+    model, class_ids, class_names = load_checkpoint(args.checkpoint, build_model, device, class_ids, class_names)
+    print(f"[체크포인트 로드] {args.checkpoint} -> {args.crop} {class_ids}")
+
+    paths = artifact_paths(out_dir, args.crop)
+    example = torch.randn(1, 3, 224, 224)
+    check_batch = torch.randn(4, 3, 224, 224)
+    results = {}
+
+    # 정합성 검사는 메모리의 모델이 아니라 저장한 파일을 서버와 같은 방법으로 다시 읽어서
+    error = try_export("TorchScript", lambda: export_torchscript(model, example, paths["torchscript"]),
+                       paths["torchscript"])
+    if error:
+        results["torchscript"] = error
+    else:
+        results["torchscript"] = check_saved(model, lambda: torch.jit.load(paths["torchscript"], map_location=device),
+                                             check_batch)
+        print(f"[TorchScript] {paths['torchscript']} {results['torchscript']}")
+
+    if not args.skip_onnx:
+        error = try_export("ONNX", lambda: export_onnx(model, example, paths["onnx"], opset=args.opset), paths["onnx"])
+        if error:
+            results["onnx"] = error
+        elif ort is not None:
+            results["onnx"] = check_saved(model, lambda: OnnxRunner(paths["onnx"]), check_batch)
+            print(f"[ONNX] {paths['onnx']} {results['onnx']}")
+        else:
+            print(f"[ONNX] {paths['onnx']} (onnxruntime 미설치: 정합성 검사 생략)")
+
+    # quantize_model.py 가 기록한 int8 정보는 유지
+    meta = {}
+    if os.path.exists(paths["meta"]):
+        with open(paths["meta"], "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    meta.update({
+        "crop": args.crop,
+        "class_ids": class_ids,
+        "class_names": class_names,
+        "source": os.path.abspath(args.checkpoint),
+        "parity": results,
+    })
+    with open(paths["meta"], "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    failed = [name for name, r in results.items()
+              if "error" in r or r["max_abs_diff"] > PARITY_ATOL[name] or not r["top1_match"]]
+    if failed:
+        # 정합성이 깨진 파일은 서버가 사용하지 않도록 삭제
+        for name in failed:
+            if os.path.exists(paths[name]):
+                os.remove(paths[name])
+        print(f"정합성 검사 실패: {failed}")
+        sys.exit(1)
+    print("변환 완료")
+
+
+if __name__ == "__main__":
+    main()
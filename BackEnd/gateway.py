@@ -0,0 +1,325 @@
+"""장치 게이트웨이 (ASGI, asyncio)
+
+ESP32 / ESP32-CAM이 쓰는 /get, /upload, /level, /trigger/* 와 대시보드의 /api/events(SSE)는
+이벤트 루프에서 직접 처리하고 (롱 폴링/SSE 연결은 스레드 없이 코루틴 하나만 차지), 나머지 경로(대시보드, /api/*,
+갤러리 등)는 기존 Flask 앱을 스레드 풀에서 실행한다. 파일 쓰기와 /api/predict 같은
+CPU 작업은 모두 스레드 풀(executor)에서 돌아가므로 이벤트 루프를 막지 않는다.
+
+실행:
+    pip install uvicorn
+    python gateway.py                                  # 0.0.0.0:15020
+    uvicorn gateway:app --host 0.0.0.0 --port 15020    # 같은 동작
+
+부하 테스트는 loadtest_gateway.py 참고.
+"""
+import io
+import os
+import sys
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import app4
+from commands import CMD_IDLE, device_kind
+from ingest import BadUpload, StreamingUpload
+
+GATEWAY_THREADS = int(os.environ.get("GATEWAY_THREADS", "32"))  # Flask 경로/파일 쓰기용 스레드 수
+GATEWAY_PORT = int(os.environ.get("GATEWAY_PORT", "15020"))
+
+
+class FlaskBridge:
+    """ASGI 요청을 WSGI(Flask) 앱으로 넘겨서 스레드 풀에서 실행
+
+    응답 본문은 조각마다 executor에서 꺼내서 보내므로 스트리밍 응답도 동작하지만, 조각을 기다리는 동안
+    스레드를 잡으므로 오래 열려 있는 /api/events는 Gateway.events가 루프에서 직접 처리한다.
+    클라이언트가 끊으면 응답 iterator를 닫아서 스레드를 돌려받는다.
+    """
+
+    def __init__(self, wsgi_app, executor):
+        self.wsgi_app = wsgi_app
+        self.executor = executor
+
+    def environ(self, scope, body):
+        headers = scope["headers"]
+        server = scope.get("server") or ("localhost", GATEWAY_PORT)
+        client = scope.get("client") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", ""),
+            "PATH_INFO": scope["path"],
+            "QUERY_STRING": scope["query_string"].decode("latin-1"),
+            "SERVER_NAME": server[0],
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+            "REMOTE_ADDR": client[0],
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+            "CONTENT_LENGTH": str(len(body)),
+        }
+        for name, value in headers:
+            name = name.decode("latin-1").upper().replace("-", "_")
+            value = value.decode("latin-1")
+            if name == "CONTENT_TYPE":
+                environ["CONTENT_TYPE"] = value
+            elif name != "CONTENT_LENGTH":
+                key = "HTTP_" + name
+                environ[key] = environ[key] + "," + value if key in environ else value
+        return environ
+
+    async def __call__(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        body = await read_body(receive)
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started["status"] = int(status.split(" ", 1)[0])
+            started["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+
+        def first_chunk():
+            result = self.wsgi_app(self.environ(scope, body), start_response)
+            it = iter(result)
+            return result, it, next(it, None)
+
+        result, it, chunk = await loop.run_in_executor(self.executor, first_chunk)
+        disconnected = asyncio.Event()
+
+        async def watch_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            await send({"type": "http.response.start", "status": started["status"],
+                        "headers": started["headers"]})
+            while chunk is not None and not disconnected.is_set():
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                chunk = await loop.run_in_executor(self.executor, next, it, None)
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            watcher.cancel()
+            if hasattr(result, "close"):
+                await loop.run_in_executor(self.executor, result.close)
+
+
+async def read_body(receive, max_bytes=None):
+    """본문 전체 읽기 (max_bytes를 넘으면 더 모으지 않고 BadUpload 413)"""
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if max_bytes is not None and size > max_bytes:
+            raise BadUpload(f"body larger than {max_bytes} bytes", status=413)
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+async def wait_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def respond(send, status, body, content_type="text/plain"):
+    if isinstance(body, (dict, list)):
+        body = json.dumps(body, ensure_ascii=False)
+        content_type = "application/json"
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", content_type.encode()),
+                            (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+def header(scope, name):
+    name = name.encode()
+    for k, v in scope["headers"]:
+        if k == name:
+            return v.decode("latin-1")
+    return ""
+
+
+class Gateway:
+    """장치 엔드포인트는 asyncio로, 나머지는 FlaskBridge로"""
+
+    def __init__(self, flask_app, threads=GATEWAY_THREADS):
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="gateway")
+        self.bridge = FlaskBridge(flask_app, self.executor)
+        self.routes = {
+            ("GET", "/get"): self.get_poll,
+            ("POST", "/upload"): self.upload,
+            ("GET", "/level"): self.level,
+            ("GET", "/trigger/cam"): lambda s, r, snd, q: self.trigger("ESP32CAM", snd, q),
+            ("GET", "/trigger/esp32"): lambda s, r, snd, q: self.trigger("ESP32", snd, q),
+            ("GET", "/api/gateway/stats"): self.stats,
+            ("GET", "/api/events"): self.events,
+        }
+        self.waiting = 0  # 롱 폴링 중인 장치 연결 수
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        if scope["type"] != "http":
+            return
+        handler = self.routes.get((scope["method"], scope["path"]))
+        if handler is None:
+            return await self.bridge(scope, receive, send)
+        query = {k: v[0] for k, v in parse_qs(scope["query_string"].decode("latin-1")).items()}
+        await handler(scope, receive, send, query)
+
+    async def lifespan(self, receive, send):
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await loop.run_in_executor(self.executor, app4.startup)
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def events(self, scope, receive, send, query):
+        """/api/events (SSE): app4.api_events와 같은 파라미터/본문, 대기 중에 스레드를 쓰지 않음"""
+        devices = query.get("device")
+        types = query.get("types")
+        last_id = header(scope, "last-event-id") or query.get("last_id")
+        try:
+            last_id = int(last_id) if last_id else None
+        except ValueError:
+            last_id = None
+        stream = app4.events.stream_async(set(devices.split(",")) if devices else None,
+                                          set(types.split(",")) if types else None,
+                                          last_id)
+        disconnected = asyncio.ensure_future(wait_disconnect(receive))
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream; charset=utf-8"),
+                                (b"cache-control", b"no-cache"),
+                                (b"x-accel-buffering", b"no")]})
+        try:
+            while True:
+                chunk = asyncio.ensure_future(stream.__anext__())
+                await asyncio.wait({chunk, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if not chunk.done():
+                    chunk.cancel()
+                    try:
+                        await chunk  # 생성기의 finally(구독 해제)까지 실행되도록
+                    except (asyncio.CancelledError, StopAsyncIteration):
+                        pass
+                    break
+                await send({"type": "http.response.body", "body": chunk.result().encode("utf-8"),
+                            "more_body": True})
+        except OSError:
+            pass  # 클라이언트가 끊긴 상태에서 send
+        finally:
+            disconnected.cancel()
+            await stream.aclose()
+
+    async def get_poll(self, scope, receive, send, query):
+        device_id = query.get("id", "UNKNOWN")
+        app4.presence.seen(device_id)
+        if device_kind(device_id) is None:
+            return await respond(send, 200, "400")  # 알 수 없는 장치
+
+        wait = app4.parse_wait(query.get("wait"))
+        self.waiting += 1
+        try:
+            command = await app4.commands.wait_async(device_id, wait)
+        finally:
+            self.waiting -= 1
+        if wait:
+            app4.presence.seen(device_id)
+        await respond(send, 200, command or CMD_IDLE)
+
+    async def upload(self, scope, receive, send, query):
+        device_id = query.get("id", "UNKNOWN")
+        if "multipart/form-data" in header(scope, "content-type"):
+            # multipart는 Flask 쪽 파서 사용
+            return await self.bridge(scope, receive, send)
+        if device_id.startswith("ESP32"):
+            app4.presence.seen(device_id)
+        loop = asyncio.get_running_loop()
+        try:
+            info = {}
+            saved_path = None
+            if device_id.startswith("ESP32CAM"):
+                saved_path = app4.cam_upload_path(device_id)
+                try:
+                    _, info["bytes"], info["hash"] = await self.receive_to_file(receive, saved_path)
+                except Exception:
+                    app4.discard_upload(saved_path)
+                    raise
+                app4.accept_cam_upload(device_id, saved_path, query.get("crop"), info["hash"])
+            elif device_id.startswith("ESP32"):
+                length = header(scope, "content-length")
+                if length.isdigit() and int(length) > app4.MAX_SENSOR_BYTES:
+                    raise BadUpload(f"sensor payload larger than {app4.MAX_SENSOR_BYTES} bytes", status=413)
+                body = await read_body(receive, app4.MAX_SENSOR_BYTES)
+                info = await loop.run_in_executor(self.executor, app4.accept_sensor_upload,
+                                                  device_id, body)
+            else:
+                return await respond(send, 400, {"status": "fail", "error": "unknown device"})
+        except BadUpload as e:
+            return await respond(send, e.status, {"status": "fail", "error": str(e)})
+        except Exception as e:
+            return await respond(send, 500, {"status": "fail", "error": str(e)})
+        await respond(send, 200, {"status": "ok",
+                                  "saved": app4.upload_store.rel_path(saved_path) if saved_path else "sensor_data",
+                                  **info})
+
+    async def receive_to_file(self, receive, final_path):
+        """ASGI 본문 조각을 받는 대로 임시 파일에 기록 (파일 쓰기는 executor에서) -> (경로, 크기, 해시)"""
+        loop = asyncio.get_running_loop()
+        with StreamingUpload(app4.UPLOAD_DIR, app4.MAX_UPLOAD_BYTES) as up:
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    raise BadUpload("client disconnected during upload")
+                chunk = message.get("body", b"")
+                if chunk:
+                    await loop.run_in_executor(self.executor, up.write, chunk)
+                if not message.get("more_body"):
+                    break
+            await loop.run_in_executor(self.executor, up.commit, final_path)
+            return final_path, up.size, up.digest
+
+    async def level(self, scope, receive, send, query):
+        await respond(send, 200, app4.PLANT_LEVEL)
+
+    async def trigger(self, kind, send, query):
+        body, status = app4.push_trigger(kind, query.get("id"))
+        await respond(send, status, body)
+
+
+    async def stats(self, scope, receive, send, query):
+        await respond(send, 200, {"ok": True, "long_polling": self.waiting,
+                                  "threads": GATEWAY_THREADS, "commands": app4.commands.stats()})
+
+
+app = Gateway(app4.app)
+
+
+if __name__ == "__main__":
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("gateway.py 실행에는 uvicorn이 필요합니다: pip install uvicorn")
+    # 유휴 장치 연결을 많이 받을 수 있도록 backlog를 늘리고 keep-alive는 롱 폴링보다 길게
+    uvicorn.run(app, host="0.0.0.0", port=GATEWAY_PORT, backlog=4096,
+                timeout_keep_alive=int(app4.LONGPOLL_MAX_S) + 5, log_level="warning")
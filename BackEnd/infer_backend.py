@@ -0,0 +1,94 @@
+import os
+import json
+
+import torch
+
+try:
+    import onnxruntime as ort
+except ImportError:  # onnxruntime이 없으면 TorchScript/eager만 사용
+    ort = None
+
+# export_model.py / quantize_model.py 가 만드는 파일 이름 규칙
+#   {crop}_disease_model.ts.pt  : trace + freeze 된 TorchScript
+#   {crop}_disease_model.onnx   : ONNX (배치 축 동적)
+#   {crop}_disease_model_int8.ts.pt : quantize_model.py 로 만든 INT8 TorchScript
+#   {crop}_disease_model.json   : 클래스 정보 + 원본 체크포인트 정보
+# int8은 정확도가 조금 떨어질 수 있어서 auto에는 포함하지 않고 INFER_BACKEND=int8 로만 사용
+BACKENDS = ("auto", "onnx", "torchscript", "int8", "eager")
+
+
+def artifact_paths(model_dir, crop):
+    stem = os.path.join(model_dir, f"{crop}_disease_model")
+    return {
+        "torchscript": stem + ".ts.pt",
+        "onnx": stem + ".onnx",
+        "int8": stem + "_int8.ts.pt",
+        "meta": stem + ".json",
+    }
+
+
+def load_meta(model_dir, crop):
+    path = artifact_paths(model_dir, crop)["meta"]
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class OnnxRunner:
+    """ONNX Runtime 세션을 torch 모델처럼 호출할 수 있게 감싼 것 (입력/출력 모두 torch.Tensor)"""
+
+    def __init__(self, path, num_threads=0):
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            opts.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x):
+        out = self.session.run(None, {self.input_name: x.detach().cpu().numpy()})[0]
+        return torch.from_numpy(out)
+
+
+def _is_fresh(artifact, source):
+    """원본 체크포인트보다 오래된 변환 파일은 사용하지 않는다"""
+    if not os.path.exists(artifact):
+        return False
+    return not source or not os.path.exists(source) or os.path.getmtime(artifact) >= os.path.getmtime(source)
+
+
+def load_runner(model_dir, crop, backend, device, source_path=None):
+    """변환된 모델이 있으면 (runner, 백엔드 이름, meta) 반환, 없으면 None (eager 사용)
+
+    backend="auto"이면 ONNX Runtime -> TorchScript 순서로 시도한다.
+    파일을 읽다가 실패하면(다른 torch 버전에서 만든 파일 등) 다음 백엔드로, 모두 실패하면 eager.
+    """
+    if backend == "eager":
+        return None
+    meta = load_meta(model_dir, crop)
+    if meta is None:
+        return None
+    paths = artifact_paths(model_dir, crop)
+    source = source_path or meta.get("source")
+
+    order = ["onnx", "torchscript"] if backend == "auto" else [backend]
+    for name in order:
+        if not _is_fresh(paths[name], source):
+            continue
+        try:
+            if name == "onnx":
+                if ort is None:
+                    continue
+                return OnnxRunner(paths["onnx"]), "onnx", meta
+            if name == "int8":
+                # 양자화할 때 쓴 엔진(x86/fbgemm/qnnpack)과 같은 엔진으로 실행해야 함
+                engine = meta.get("int8", {}).get("engine")
+                if engine in torch.backends.quantized.supported_engines:
+                    torch.backends.quantized.engine = engine
+            runner = torch.jit.load(paths[name], map_location=device)
+            runner.eval()
+            return runner, name, meta
+        except Exception as e:
+            print(f"[추론 백엔드] {crop} {name} 로드 실패, 다음 백엔드 사용: {e}")
+    return None
@@ -0,0 +1,97 @@
+import os
+import hashlib
+import tempfile
+
+CHUNK_SIZE = 64 * 1024
+JPEG_SOI = b"\xff\xd8\xff"  # JPEG 파일 시작 표시 (SOI + 다음 마커)
+
+
+class BadUpload(ValueError):
+    """JPEG가 아니거나 너무 큰 업로드 (status: 응답 코드)"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class StreamingUpload:
+    """요청 본문을 조각(chunk)째로 임시 파일에 쓰면서 해시/JPEG 헤더 확인
+
+    본문 전체를 메모리에 올리지 않으므로 프레임 크기와 상관없이 요청당 메모리는 CHUNK_SIZE 정도.
+    임시 파일은 최종 폴더 안에 만들어서 commit() 때 os.replace로 한 번에 옮긴다
+    (다른 요청/진단 워커가 쓰다 만 파일을 보는 일이 없음). 실패하거나 commit 전에 끝나면 삭제.
+
+        with StreamingUpload(UPLOAD_DIR) as up:
+            for chunk in chunks:
+                up.write(chunk)
+            path = up.commit(final_path)
+    """
+
+    def __init__(self, dest_dir, max_bytes=None, require_jpeg=True):
+        self.max_bytes = max_bytes
+        self.require_jpeg = require_jpeg
+        self.size = 0
+        self._hash = hashlib.blake2b(digest_size=16)  # pred_cache.image_key와 같은 해시
+        self._head = b""
+        fd, self.tmp_path = tempfile.mkstemp(dir=dest_dir, prefix=".upload-", suffix=".part")
+        self._f = os.fdopen(fd, "wb")
+
+    def write(self, chunk):
+        if not chunk:
+            return
+        self.size += len(chunk)
+        if self.max_bytes and self.size > self.max_bytes:
+            raise BadUpload(f"upload larger than {self.max_bytes} bytes", status=413)
+        if self.require_jpeg and len(self._head) < len(JPEG_SOI):
+            self._head += chunk[:len(JPEG_SOI) - len(self._head)]
+            if not JPEG_SOI.startswith(self._head[:len(JPEG_SOI)]):
+                raise BadUpload("not a JPEG image")
+        self._hash.update(chunk)
+        self._f.write(chunk)
+
+    @property
+    def digest(self):
+        return self._hash.hexdigest()
+
+    def commit(self, final_path):
+        """임시 파일 -> final_path (원자적 이동)"""
+        if self.require_jpeg and self._head != JPEG_SOI:
+            raise BadUpload("not a JPEG image")
+        self._f.close()
+        os.replace(self.tmp_path, final_path)
+        self.tmp_path = None
+        return final_path
+
+    def abort(self):
+        if not self._f.closed:
+            self._f.close()
+        if self.tmp_path and os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        self.tmp_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.abort()  # commit 했으면 아무것도 안 함
+
+
+def file_digest(path):
+    """저장된 파일의 해시 (StreamingUpload.digest / pred_cache.image_key와 같은 값)"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def save_stream(read, dest_dir, final_path, max_bytes=None, require_jpeg=True):
+    """read(n) 함수(request.stream.read 등)에서 끝까지 읽어서 저장 -> (경로, 크기, 해시)"""
+    with StreamingUpload(dest_dir, max_bytes, require_jpeg) as up:
+        while True:
+            chunk = read(CHUNK_SIZE)
+            if not chunk:
+                break
+            up.write(chunk)
+        up.commit(final_path)
+        return final_path, up.size, up.digest
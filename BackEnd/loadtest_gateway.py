@@ -0,0 +1,186 @@
+"""장치 게이트웨이 부하 테스트 (ESP32 / ESP32-CAM 여러 대 흉내)
+
+사용 예:
+    python gateway.py &                                   # 또는 python app4.py (Flask)
+    python loadtest_gateway.py --idle 2000 --sensors 200 --cams 20 --duration 60
+
+- idle    : /get?wait=N 롱 폴링으로 대기만 하는 CAM 장치 수 (유휴 연결 유지 능력)
+- sensors : 주기적으로 센서 값을 POST 하는 ESP32 수 (--sensor-format text / kv / binary)
+- cams    : 주기적으로 JPEG 프레임을 POST 하는 ESP32-CAM 수
+- 매초 임의의 유휴 장치에 /trigger/cam?id= 를 보내고, 그 장치가 201을 받기까지의 시간(명령 지연) 측정
+외부 라이브러리 없이 asyncio 소켓으로 HTTP/1.1 요청을 보낸다.
+"""
+import io
+import time
+import random
+import struct
+import asyncio
+import argparse
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = {}   # 종류 -> [초]
+        self.errors = {}
+        self.open = 0
+        self.max_open = 0
+
+    def ok(self, kind, seconds):
+        self.latencies.setdefault(kind, []).append(seconds)
+
+    def fail(self, kind):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def report(self, elapsed):
+        print(f"\n{'kind':<10} {'count':>7} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for kind in sorted(set(self.latencies) | set(self.errors)):
+            lat = sorted(self.latencies.get(kind, []))
+            n = len(lat)
+
+            def pct(p):
+                return lat[min(n - 1, int(n * p))] * 1000 if n else 0.0
+
+            print(f"{kind:<10} {n:>7} {self.errors.get(kind, 0):>5} {n / elapsed:>8.1f} "
+                  f"{pct(0.50):>8.1f} {pct(0.95):>8.1f} {pct(0.99):>8.1f}")
+        print(f"동시 연결 최대 {self.max_open}")
+
+
+async def http(stats, host, port, method, path, body=b"", content_type="text/plain", timeout=60):
+    """요청 한 번 (Connection: close) -> (상태 코드, 본문)"""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    stats.open += 1
+    stats.max_open = max(stats.max_open, stats.open)
+    try:
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n"
+                f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n")
+        writer.write(head.encode() + body)
+        await writer.drain()
+        data = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        stats.open -= 1
+        writer.close()
+    head, _, payload = data.partition(b"\r\n\r\n")
+    return int(head.split(b" ", 2)[1]), payload
+
+
+def make_frame(width, height, seed):
+    """ESP32-CAM 프레임 대신 쓸 JPEG (PIL이 없으면 JPEG 헤더만 맞춘 임의 bytes)"""
+    try:
+        from PIL import Image
+        import numpy as np
+    except ImportError:
+        rng = random.Random(seed)
+        return b"\xff\xd8\xff\xe0" + bytes(rng.getrandbits(8) for _ in range(width * height // 10)) + b"\xff\xd9"
+    arr = np.random.default_rng(seed).integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(arr).save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
+
+
+SENSOR_BODY = "Temp: {t:.1f}C\nHumidity: {h:.1f}%\nSoil: {s}%\nWater: {w:.1f}%\nLED: 0\nFAN: 1\n"
+SENSOR_KV = "t={t:.1f}&h={h:.1f}&s={s}&w={w:.1f}&l=0&f=1"
+SENSOR_RECORD = struct.Struct("<BBIhHBH")  # sensor_payload.RECORD_V1 과 같은 배치
+
+
+def sensor_body(fmt):
+    t, h, s, w = random.uniform(15, 30), random.uniform(30, 80), random.randint(0, 100), random.uniform(0, 100)
+    if fmt == "binary":
+        return SENSOR_RECORD.pack(1, 0b10, 0, round(t * 10), round(h * 10), s, round(w * 10))
+    return (SENSOR_KV if fmt == "kv" else SENSOR_BODY).format(t=t, h=h, s=s, w=w).encode()
+
+
+async def idle_device(args, stats, device_id, triggered, stop_at):
+    while time.monotonic() < stop_at:
+        t0 = time.monotonic()
+        try:
+            status, body = await http(stats, args.host, args.port, "GET",
+                                      f"/get?id={device_id}&wait={args.wait}", timeout=args.wait + 30)
+            stats.ok("poll", time.monotonic() - t0)
+            if body.strip() == b"201" and device_id in triggered:
+                stats.ok("command", time.monotonic() - triggered.pop(device_id))
+        except Exception:
+            stats.fail("poll")
+            await asyncio.sleep(1)
+
+
+async def sensor_device(args, stats, device_id, stop_at):
+    await asyncio.sleep(random.uniform(0, args.sensor_interval))
+    while time.monotonic() < stop_at:
+        body = sensor_body(args.sensor_format)
+        t0 = time.monotonic()
+        try:
+            status, _ = await http(stats, args.host, args.port, "POST", f"/upload?id={device_id}", body)
+            if status == 200:
+                stats.ok("sensor", time.monotonic() - t0)
+            else:
+                stats.fail("sensor")
+        except Exception:
+            stats.fail("sensor")
+        await asyncio.sleep(args.sensor_interval)
+
+
+async def cam_device(args, stats, device_id, frames, stop_at):
+    await asyncio.sleep(random.uniform(0, args.cam_interval))
+    while time.monotonic() < stop_at:
+        t0 = time.monotonic()
+        try:
+            status, _ = await http(stats, args.host, args.port, "POST", f"/upload?id={device_id}",
+                                   random.choice(frames), "application/octet-stream")
+            if status == 200:
+                stats.ok("upload", time.monotonic() - t0)
+            else:
+                stats.fail("upload")
+        except Exception:
+            stats.fail("upload")
+        await asyncio.sleep(args.cam_interval)
+
+
+async def trigger_loop(args, stats, idle_ids, triggered, stop_at):
+    while time.monotonic() < stop_at and idle_ids:
+        await asyncio.sleep(1.0 / args.trigger_rate)
+        device_id = random.choice(idle_ids)
+        if device_id in triggered:
+            continue
+        triggered[device_id] = time.monotonic()
+        try:
+            await http(stats, args.host, args.port, "GET", f"/trigger/cam?id={device_id}")
+        except Exception:
+            triggered.pop(device_id, None)
+            stats.fail("trigger")
+
+
+async def main(args):
+    stats = Stats()
+    stop_at = time.monotonic() + args.duration
+    frames = [make_frame(args.width, args.height, seed) for seed in range(4)]
+    idle_ids = [f"ESP32CAM-LT{i:05d}" for i in range(args.idle)]
+    triggered = {}
+
+    tasks = [idle_device(args, stats, d, triggered, stop_at) for d in idle_ids]
+    tasks += [sensor_device(args, stats, f"ESP32-LT{i:05d}", stop_at) for i in range(args.sensors)]
+    tasks += [cam_device(args, stats, f"ESP32CAM-LTC{i:04d}", frames, stop_at) for i in range(args.cams)]
+    tasks.append(trigger_loop(args, stats, idle_ids, triggered, stop_at))
+
+    print(f"유휴 {args.idle}대, 센서 {args.sensors}대, 카메라 {args.cams}대, {args.duration}초 "
+          f"-> http://{args.host}:{args.port}")
+    t0 = time.monotonic()
+    await asyncio.gather(*tasks)
+    stats.report(time.monotonic() - t0)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="ESP32 / ESP32-CAM 장치 게이트웨이 부하 테스트")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=15020)
+    ap.add_argument("--duration", type=float, default=30)
+    ap.add_argument("--idle", type=int, default=500, help="롱 폴링으로 대기하는 CAM 수")
+    ap.add_argument("--wait", type=float, default=20, help="/get?wait= 값 (초)")
+    ap.add_argument("--sensors", type=int, default=50)
+    ap.add_argument("--sensor-interval", type=float, default=5)
+    ap.add_argument("--sensor-format", choices=("text", "kv", "binary"), default="text")
+    ap.add_argument("--cams", type=int, default=5)
+    ap.add_argument("--cam-interval", type=float, default=10)
+    ap.add_argument("--trigger-rate", type=float, default=2, help="초당 /trigger/cam?id= 횟수")
+    ap.add_argument("--width", type=int, default=1600)
+    ap.add_argument("--height", type=int, default=1200)
+    asyncio.run(main(ap.parse_args()))
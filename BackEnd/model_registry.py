@@ -0,0 +1,275 @@
+import os
+import glob
+import time
+import threading
+from collections import OrderedDict
+
+import torch
+import torch.nn as nn
+from torchvision import models
+
+from batcher import BatchInferenceQueue
+from infer_backend import load_runner
+
+FULL_SUFFIX = "_disease_model_full.pth"
+META_SUFFIX = "_disease_model.json"
+
+# best_{crop}_disease_model.pth 처럼 state_dict만 있는 파일을 위한 클래스 정보 (Deep/*_deep.py 와 동일)
+KNOWN_CLASSES = {
+    "lettuce": (['0', '9', '10'], {'0': '정상', '9': '상추균핵병', '10': '상추노균병'}),
+    "tomato": (['0', '18', '19'], {'0': '정상', '18': '토마토잎곰팡이병', '19': '토마토황화잎말이바이러스병'}),
+    "strawberry": (['0', '7', '8'], {'0': '정상', '7': '딸기잿빛곰팡이병', '8': '딸기흰가루병'}),
+    "pepper": (['0', '3', '4'], {'0': '정상', '3': '고추마일드모틀바이러스병', '4': '고추점무늬병'}),
+}
+
+
+def build_model(num_classes):
+    # 가중치는 체크포인트로 전부 덮어쓰므로 ImageNet 가중치 없이 구조만 생성 (다운로드/캐시 읽기 없음)
+    m = models.efficientnet_b0(weights=None)
+    in_f = m.classifier[1].in_features
+    m.classifier = nn.Sequential(nn.Dropout(0.3), nn.Linear(in_f, num_classes))
+    return m
+
+
+def _torch_load(path, device):
+    """가능하면 mmap으로 로드 (파일을 통째로 읽어 복사하지 않고 페이지 캐시를 그대로 사용)"""
+    try:
+        return torch.load(path, map_location=device, mmap=True, weights_only=True)
+    except TypeError:
+        # mmap/weights_only 인자가 없는 구버전 torch
+        return torch.load(path, map_location=device)
+    except RuntimeError:
+        # 구버전(zip 아님) 포맷은 mmap 불가
+        return torch.load(path, map_location=device)
+
+
+def _build_loaded(build_fn, num_classes, state):
+    """meta 장치에서 구조만 만들고 체크포인트 텐서를 그대로 붙인다 (랜덤 초기화 생략)"""
+    try:
+        with torch.device("meta"):
+            model = build_fn(num_classes)
+        model.load_state_dict(state, assign=True)
+        return model
+    except (AttributeError, TypeError):
+        # torch < 2.1: 일반 생성 후 복사
+        model = build_fn(num_classes)
+        model.load_state_dict(state)
+        return model
+
+
+def load_checkpoint(path, build_fn, device, class_ids=None, class_names=None, timings=None):
+    """full 체크포인트 또는 state_dict 파일에서 eager 모델 생성 -> (model, class_ids, class_names)
+
+    timings에 dict를 넘기면 단계별 소요 시간(초)을 기록한다.
+    """
+    t0 = time.perf_counter()
+    ckpt = _torch_load(path, device)
+    t1 = time.perf_counter()
+
+    if isinstance(ckpt, dict) and "model_state_dict" in ckpt:
+        # Deep/*_deep.py 에서 저장한 full 체크포인트
+        state = ckpt["model_state_dict"]
+        disease_to_idx = ckpt.get("disease_to_idx")
+        if disease_to_idx:
+            class_ids = [d for d, _ in sorted(disease_to_idx.items(), key=lambda kv: kv[1])]
+        else:
+            class_ids = list(ckpt["class_names"])
+        # disease_names가 없는 체크포인트(Deep/lettuce/deepl.py 등)는 넘겨받은 이름 사용
+        class_names = ckpt.get("disease_names") or class_names or {}
+    else:
+        # best_*.pth (state_dict만 저장된 파일)
+        state = ckpt
+        if not class_ids:
+            raise ValueError(f"{path}: class_ids required for plain state_dict checkpoint")
+
+    model = _build_loaded(build_fn, len(class_ids), state)
+    model.eval().to(device)
+    t2 = time.perf_counter()
+    if timings is not None:
+        timings["read_s"] = round(t1 - t0, 4)
+        timings["build_s"] = round(t2 - t1, 4)
+    return model, list(class_ids), dict(class_names or {})
+
+
+class ModelEntry:
+    """메모리에 올라간 작물 모델 하나 (모델 + 클래스 정보 + 배치 큐)"""
+
+    def __init__(self, crop, path, model, class_ids, class_names, queue, backend="eager", version=None):
+        self.crop = crop
+        self.path = path
+        self.model = model
+        self.class_ids = class_ids        # 인덱스 -> 질병 코드
+        self.class_names = class_names    # 질병 코드 -> 한글 이름
+        self.queue = queue
+        self.backend = backend
+        self.version = version or crop
+
+
+class ModelRegistry:
+    """작물별 모델 레지스트리
+
+    model_dir에서 Deep/*에서 만든 `{crop}_disease_model_full.pth`를 찾아 등록해 두고,
+    해당 작물 요청이 처음 들어올 때 모델을 로드한다.
+    메모리에는 최대 capacity개만 올려두고, 넘치면 가장 오래 안 쓴 모델을 내린다(LRU).
+    backend가 eager가 아니면 export_model.py로 만든 ONNX/TorchScript 파일을 우선 사용한다.
+    """
+
+    def __init__(self, model_dir, build_fn, device, capacity=2, max_batch=16, max_wait_ms=10,
+                 backend="auto", batching=True):
+        self.model_dir = model_dir
+        self.build_fn = build_fn
+        self.device = device
+        self.backend = backend
+        self.capacity = max(1, capacity)
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.batching = batching           # False면 배치 큐(스레드) 없이 모델만 로드 (프로세스 워커용)
+
+        self._specs = {}                   # crop -> 체크포인트 정보
+        self._loaded = OrderedDict()       # crop -> ModelEntry (LRU 순서)
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.loads = 0
+        self.evictions = 0
+        self.load_times = {}               # crop -> 마지막 로드 소요 시간
+
+        self.discover()
+
+    # ===== 등록 =====
+    def discover(self):
+        """model_dir의 체크포인트/변환 파일을 작물별로 등록
+
+        우선순위: {crop}_disease_model_full.pth > best_{crop}_disease_model.pth > 변환 파일(.json)만 있는 경우
+        """
+        for path in sorted(glob.glob(os.path.join(self.model_dir, "*" + FULL_SUFFIX))):
+            crop = os.path.basename(path)[:-len(FULL_SUFFIX)]
+            # 클래스 코드는 체크포인트에서, 이름은 체크포인트에 없을 때 쓸 기본값
+            self.register(crop, path, class_names=KNOWN_CLASSES.get(crop, (None, None))[1])
+        for crop, (ids, names) in KNOWN_CLASSES.items():
+            path = os.path.join(self.model_dir, f"best_{crop}_disease_model.pth")
+            if crop not in self._specs and os.path.exists(path):
+                self.register(crop, path, class_ids=ids, class_names=names)
+        for path in sorted(glob.glob(os.path.join(self.model_dir, "*" + META_SUFFIX))):
+            crop = os.path.basename(path)[:-len(META_SUFFIX)]
+            if crop not in self._specs:
+                self.register(crop, None)
+        return self.crops()
+
+    def register(self, crop, path, class_ids=None, class_names=None):
+        """체크포인트 등록. state_dict만 있는 파일이면 class_ids/class_names를 같이 넘긴다"""
+        with self._lock:
+            self._specs[crop] = {"path": path, "class_ids": class_ids, "class_names": class_names}
+            self._load_locks.setdefault(crop, threading.Lock())
+
+    def crops(self):
+        return sorted(self._specs)
+
+    def version(self, crop):
+        """모델을 로드하지 않고 알 수 있는 버전 문자열 (작물 + 백엔드 설정 + 파일 수정 시각)
+
+        원본 체크포인트와 export 메타(.json)의 수정 시각을 같이 쓴다.
+        export_model/quantize_model은 산출물을 만들 때마다 메타를 다시 쓰므로
+        체크포인트가 그대로여도 실제로 쓰는 모델(torchscript/onnx/int8)이 바뀌면 버전이 바뀐다.
+        """
+        paths = [self._specs[crop]["path"], os.path.join(self.model_dir, crop + META_SUFFIX)]
+        mtimes = [os.stat(p).st_mtime_ns if p and os.path.exists(p) else 0 for p in paths]
+        return f"{crop}:{self.backend}:" + ":".join(map(str, mtimes))
+
+    # ===== 조회 =====
+    def get(self, crop):
+        """작물 모델을 반환 (없으면 로드, 용량 초과 시 LRU 제거)"""
+        if crop not in self._specs:
+            raise KeyError(crop)
+
+        with self._lock:
+            entry = self._loaded.get(crop)
+            if entry is not None:
+                self._loaded.move_to_end(crop)
+                return entry
+
+        # 같은 작물을 동시에 두 번 로드하지 않도록 작물별 락
+        with self._load_locks[crop]:
+            with self._lock:
+                entry = self._loaded.get(crop)
+                if entry is not None:
+                    self._loaded.move_to_end(crop)
+                    return entry
+
+            entry = self._load(crop, self._specs[crop])
+
+            evicted = []
+            with self._lock:
+                self._loaded[crop] = entry
+                self.loads += 1
+                while len(self._loaded) > self.capacity:
+                    _, old = self._loaded.popitem(last=False)
+                    evicted.append(old)
+                    self.evictions += 1
+
+        for old in evicted:
+            print(f"[모델 제거] {old.crop}")
+            if old.queue:
+                old.queue.stop(wait=False)
+        return entry
+
+    def preload(self, crops):
+        """서버 시작 시 미리 올려둘 작물 모델 로드 (없는 작물은 무시)"""
+        for crop in crops:
+            if crop in self._specs:
+                self.get(crop)
+
+    def predict(self, crop, x):
+        """crop 모델로 단일 이미지 텐서 예측 -> (entry, 확률)"""
+        for _ in range(2):
+            entry = self.get(crop)
+            try:
+                return entry, entry.queue.predict(x)
+            except RuntimeError:
+                # 예측 도중 LRU로 내려간 경우 다시 로드해서 한 번 더 시도
+                if not entry.queue.stopped:
+                    raise
+        raise RuntimeError(f"model '{crop}' unavailable")
+
+    def stats(self):
+        with self._lock:
+            loaded = {crop: e.queue.stats() if e.queue else None for crop, e in self._loaded.items()}
+            backends = {crop: e.backend for crop, e in self._loaded.items()}
+        return {
+            "crops": self.crops(),
+            "capacity": self.capacity,
+            "loaded": list(loaded),
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "backend": self.backend,
+            "backends": backends,
+            "load_times": dict(self.load_times),
+            "batch": loaded,
+        }
+
+    # ===== 로드 =====
+    def _load(self, crop, spec):
+        path = spec["path"]
+        t0 = time.perf_counter()
+        timings = {}
+        found = load_runner(self.model_dir, crop, self.backend, self.device, source_path=path)
+        if found is not None:
+            # 변환된 모델 사용 (클래스 정보는 .json 에서)
+            model, backend, meta = found
+            class_ids = meta["class_ids"]
+            class_names = (meta.get("class_names") or spec["class_names"]
+                           or KNOWN_CLASSES.get(crop, (None, None))[1] or {})
+        elif path:
+            model, class_ids, class_names = load_checkpoint(
+                path, self.build_fn, self.device, spec["class_ids"], spec["class_names"], timings)
+            backend = "eager"
+        else:
+            raise FileNotFoundError(f"no usable model for '{crop}' (backend={self.backend})")
+
+        queue = None
+        if self.batching:
+            queue = BatchInferenceQueue(model, self.device, max_batch=self.max_batch, max_wait_ms=self.max_wait_ms)
+        timings["total_s"] = round(time.perf_counter() - t0, 4)
+        self.load_times[crop] = timings
+        print(f"[모델 로드] {crop}: {path or 'converted'} ({len(class_ids)} classes, {backend}, {timings['total_s']}s)")
+        return ModelEntry(crop, path, model, list(class_ids), dict(class_names), queue, backend,
+                          version=self.version(crop))
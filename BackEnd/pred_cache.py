@@ -0,0 +1,116 @@
+import json
+import hashlib
+import datetime
+import threading
+from collections import OrderedDict
+
+
+def image_key(data, version, digest=None):
+    """이미지 bytes 해시 + 모델 버전으로 캐시 키 생성
+
+    digest: 이미 계산해 둔 같은 해시 (ingest가 업로드 원본에서 계산한 값).
+    자동 진단은 224 변형으로 추론하지만 키는 원본 해시로 만들어서, 같은 원본 JPEG를
+    /api/predict로 다시 보내도 캐시를 쓴다.
+    """
+    return (digest or hashlib.blake2b(data, digest_size=16).hexdigest()) + "@" + version
+
+
+class PredictionCache:
+    """같은 이미지의 예측 결과를 재사용하는 캐시
+
+    메모리에는 최대 capacity개를 LRU로 유지하고,
+    db(db.Database)를 주면 SQLite(pred_cache 테이블)에도 저장해서 재시작 후에도 사용한다.
+    - writes(db.WriteBehindBuffer)를 주면 저장은 버퍼에 넣기만 함 (요청 스레드가 커밋을 기다리지 않음)
+    - 테이블은 max_rows행까지만 유지: prune_every번 저장할 때마다 오래된 행부터 삭제
+    """
+
+    def __init__(self, capacity=2048, db=None, writes=None, max_rows=50000, prune_every=256):
+        self.capacity = capacity
+        self.db = db
+        self.writes = writes
+        self.max_rows = max_rows
+        self.prune_every = prune_every
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        if db is not None:
+            self._init_db()
+
+    def _init_db(self):
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS pred_cache (
+                key TEXT PRIMARY KEY,
+                result TEXT,
+                timestamp TEXT
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_pred_cache_timestamp ON pred_cache (timestamp)")
+
+    def get(self, key):
+        with self._lock:
+            result = self._mem.get(key)
+            if result is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return result
+
+        if self.db is not None:
+            row = self.db.query_one("SELECT result FROM pred_cache WHERE key = ?", (key,))
+            if row:
+                result = json.loads(row[0])
+                with self._lock:
+                    self.db_hits += 1
+                self._put_mem(key, result)
+                return result
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, result):
+        self._put_mem(key, result)
+        if self.db is None:
+            return
+        ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._write("INSERT OR REPLACE INTO pred_cache (key, result, timestamp) VALUES (?, ?, ?)",
+                    (key, json.dumps(result, ensure_ascii=False), ts))
+        with self._lock:
+            self._puts += 1
+            prune = self.max_rows and self._puts % self.prune_every == 0
+        if prune:
+            # 최근 max_rows행만 남김 (timestamp 인덱스를 최신순으로 훑어서 그 뒤를 삭제)
+            self._write("""
+                DELETE FROM pred_cache WHERE key IN (
+                    SELECT key FROM pred_cache ORDER BY timestamp DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_rows,))
+
+    def _write(self, sql, params):
+        if self.writes is not None:
+            self.writes.add(sql, params)
+        else:
+            self.db.execute(sql, params)
+
+    def _put_mem(self, key, result):
+        with self._lock:
+            self._mem[key] = result
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.capacity:
+                self._mem.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.db_hits + self.misses
+            return {
+                "size": len(self._mem),
+                "capacity": self.capacity,
+                "persistent": self.db is not None,
+                "max_rows": self.max_rows,
+                "hits": self.hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.db_hits) / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,46 @@
+import io
+
+import numpy as np
+import torch
+from PIL import Image
+
+# 학습 때와 같은 ImageNet 정규화 값 (Deep/*_deep.py 의 transforms.Normalize)
+MEAN = (0.485, 0.456, 0.406)
+STD = (0.229, 0.224, 0.225)
+INPUT_SIZE = 224
+
+# (x/255 - mean)/std == x*scale - shift 로 한 번에 계산
+_SCALE = torch.tensor([1.0 / (255.0 * s) for s in STD]).view(1, 3, 1, 1)
+_SHIFT = torch.tensor([m / s for m, s in zip(MEAN, STD)]).view(1, 3, 1, 1)
+
+
+def decode_image(data, size=INPUT_SIZE):
+    """이미지 bytes -> (3, size, size) uint8 텐서
+
+    JPEG는 draft 모드로 디코딩해서(DCT 단계에서 1/2, 1/4, 1/8 축소)
+    큰 카메라 프레임을 전체 해상도로 풀지 않는다. 그 다음 한 번만 bilinear로 리사이즈한다.
+    """
+    img = Image.open(io.BytesIO(data)) if isinstance(data, (bytes, bytearray)) else Image.open(data)
+    if img.format == "JPEG":
+        img.draft("RGB", (size, size))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    if img.size != (size, size):
+        img = img.resize((size, size), Image.BILINEAR)
+    # np.asarray는 PIL 버퍼를 읽기 전용으로 감싸서 torch.from_numpy가 경고를 냄 -> 쓰기 가능한 복사본
+    arr = np.array(img, dtype=np.uint8)  # (H, W, 3), 224x224라 복사 비용은 작음
+    return torch.from_numpy(arr).permute(2, 0, 1)
+
+
+def normalize_into(out, items):
+    """uint8 이미지 텐서 리스트를 미리 할당한 float 배치 텐서에 넣고 한 번에 정규화
+
+    out: (max_batch, 3, H, W) float32 (재사용), items: [(3, H, W) uint8, ...]
+    반환: out[:len(items)] (view)
+    """
+    n = len(items)
+    batch = out[:n]
+    for i, x in enumerate(items):
+        batch[i].copy_(x)  # uint8 -> float32 변환과 복사를 한 번에
+    batch.mul_(_SCALE).sub_(_SHIFT)
+    return batch
@@ -0,0 +1,139 @@
+import time
+import datetime
+import threading
+
+ONLINE = "Online"
+OFFLINE = "Offline"
+
+
+def _fmt(ts):
+    return datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class DevicePresence:
+    """장치 접속 상태 관리 (Arduino/ESP32CAM/CAM과 백엔드의 작동 방식.txt)
+
+    - 폴링마다 DB에 쓰지 않고 메모리의 last-seen 값만 갱신
+    - Online/Offline 상태가 바뀔 때만 device_logs에 한 줄 기록
+    - n2(정기 통신 주기) + n1(응답 대기 시간) 동안 소식이 없으면 Offline 처리
+      n2는 장치 종류마다 다를 수 있음 (kind_of(device_id) -> 종류, ping_intervals[종류] -> 초)
+    - snapshot_s마다 device_presence 테이블에 현재 상태를 덮어써서 재시작 후 복구
+    """
+
+    def __init__(self, writes, insert_log_sql, ping_interval_s=30, response_timeout_s=10,
+                 snapshot_s=60, check_s=1.0, ping_intervals=None, kind_of=None):
+        self.writes = writes                  # db.WriteBehindBuffer
+        self.insert_log_sql = insert_log_sql  # (device_id, timestamp, status)
+        self.ping_interval = ping_interval_s  # n2 (종류별 값이 없을 때)
+        self.ping_intervals = ping_intervals or {}
+        self.kind_of = kind_of
+        self.response_timeout = response_timeout_s  # n1
+        self.snapshot_s = snapshot_s
+        self.check_s = check_s
+        self._devices = {}                    # device_id -> [last_seen, status, since]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.transitions = 0
+        self._thread = None
+
+    def offline_after(self, device_id=None):
+        interval = self.ping_interval
+        if device_id is not None and self.kind_of is not None:
+            interval = self.ping_intervals.get(self.kind_of(device_id), interval)
+        return interval + self.response_timeout
+
+    def load(self, db):
+        """device_presence 스냅샷에서 마지막 상태 복구"""
+        rows = db.query("SELECT device_id, last_seen, status, since FROM device_presence")
+        with self._lock:
+            for device_id, last_seen, status, since in rows:
+                self._devices[device_id] = [last_seen, status, since]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="presence", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.snapshot()
+
+    def seen(self, device_id, now=None):
+        """폴링/업로드가 들어올 때 호출 (상태가 바뀔 때만 DB 기록)"""
+        now = now or time.time()
+        with self._lock:
+            dev = self._devices.get(device_id)
+            if dev is None:
+                self._devices[device_id] = [now, ONLINE, now]
+                changed = True
+            else:
+                dev[0] = now
+                changed = dev[1] != ONLINE
+                if changed:
+                    dev[1] = ONLINE
+                    dev[2] = now
+            if changed:
+                self.transitions += 1
+        if changed:
+            self.writes.add(self.insert_log_sql, (device_id, _fmt(now), ONLINE))
+
+    def check_offline(self, now=None):
+        """last-seen이 n2 + n1보다 오래된 장치를 Offline으로 바꾼다"""
+        now = now or time.time()
+        went_offline = []
+        with self._lock:
+            for device_id, dev in self._devices.items():
+                if dev[1] == ONLINE and dev[0] < now - self.offline_after(device_id):
+                    dev[1] = OFFLINE
+                    dev[2] = now
+                    self.transitions += 1
+                    went_offline.append(device_id)
+        for device_id in went_offline:
+            self.writes.add(self.insert_log_sql, (device_id, _fmt(now), OFFLINE))
+        return went_offline
+
+    def snapshot(self):
+        """현재 상태 전체를 device_presence 테이블에 저장 (장치 수만큼의 UPSERT)"""
+        with self._lock:
+            rows = [(d, v[0], v[1], v[2]) for d, v in self._devices.items()]
+        for row in rows:
+            self.writes.add("""
+                INSERT INTO device_presence (device_id, last_seen, status, since) VALUES (?, ?, ?, ?)
+                ON CONFLICT(device_id) DO UPDATE SET
+                    last_seen = excluded.last_seen, status = excluded.status, since = excluded.since
+            """, row)
+
+    def devices(self, status=None):
+        """장치 목록 (status='Online' 이면 접속 중인 장치만)"""
+        now = time.time()
+        with self._lock:
+            items = [(d, list(v)) for d, v in self._devices.items()]
+        out = []
+        for device_id, (last_seen, st, since) in sorted(items):
+            if status and st != status:
+                continue
+            out.append({
+                "device_id": device_id,
+                "status": st,
+                "last_seen": _fmt(last_seen),
+                "since": _fmt(since),
+                "seconds_ago": round(now - last_seen, 1),
+            })
+        return out
+
+    def stats(self):
+        with self._lock:
+            total = len(self._devices)
+            online = sum(1 for v in self._devices.values() if v[1] == ONLINE)
+        return {"devices": total, "online": online, "transitions": self.transitions,
+                "offline_after_s": {"default": self.offline_after(),
+                                    **{k: v + self.response_timeout for k, v in self.ping_intervals.items()}}}
+
+    def _loop(self):
+        last_snapshot = time.monotonic()
+        while not self._stop.wait(self.check_s):
+            self.check_offline()
+            if time.monotonic() - last_snapshot >= self.snapshot_s:
+                self.snapshot()
+                last_snapshot = time.monotonic()
@@ -0,0 +1,339 @@
+import os
+import queue
+import atexit
+import itertools
+import threading
+import multiprocessing as mp
+from multiprocessing.connection import wait as wait_ready
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import torch
+
+from model_registry import ModelRegistry, build_model
+from preprocess import decode_image, normalize_into
+
+# fork 방식일 때 부모가 미리 로드해 둔 레지스트리 (자식 프로세스가 그대로 물려받음, copy-on-write)
+_FORK_REGISTRY = None
+
+
+class ProcessInferencePool:
+    """N개의 워커 프로세스에서 디코딩 + 전처리 + 추론을 실행하는 풀 (GIL 회피)
+
+    웹 요청 스레드는 이미지 bytes만 파이프로 관리 프로세스에 보내고, 관리 프로세스가
+    처리 중인 job이 가장 적은 워커의 전용 큐에 넣는다. 결과는 워커 -> 관리 프로세스 -> 부모 순서로 돌아온다.
+    fork 방식(리눅스 기본)에서는 부모가 preload 작물 모델을 먼저 로드한 뒤 fork 하므로
+    가중치 메모리를 프로세스끼리 공유한다 (mmap 로드 + copy-on-write).
+
+    주의: fork는 다른 스레드가 돌기 전에 해야 하므로 서버 시작 시 가장 먼저 만든다.
+
+    워커가 죽으면(OOM, segfault) 관리 프로세스가 그 워커에 보낸 job을 오류로 끝내고, 큐를 새로 만들어 워커를 다시 띄운다.
+    워커마다 큐가 따로라서 죽은 워커가 큐 잠금을 쥐고 있어도 다른 워커는 영향이 없고,
+    재시작 fork는 스레드가 없는 관리 프로세스에서 하므로 부모의 스레드/잠금 상태를 물려받지 않는다.
+    (spawn/forkserver는 자식이 __main__(app4.py)을 다시 import 해서 DB/스레드/풀을 또 만들기 때문에 쓰지 않음)
+    """
+
+    def __init__(self, model_dir, num_procs=2, backend="auto", capacity=2, preload=(),
+                 max_batch=8, threads_per_proc=1, start_method=None, timeout_s=60.0):
+        global _FORK_REGISTRY
+        if start_method is None:
+            start_method = "fork" if "fork" in mp.get_all_start_methods() else "spawn"
+        ctx = mp.get_context(start_method)
+
+        self.num_procs = num_procs
+        self.start_method = start_method
+        self.timeout_s = timeout_s
+        cfg = {
+            "model_dir": model_dir,
+            "backend": backend,
+            "capacity": capacity,
+            "max_batch": max_batch,
+            "threads": threads_per_proc,
+        }
+
+        if start_method == "fork":
+            reg = ModelRegistry(model_dir, build_model, torch.device("cpu"),
+                                capacity=capacity, backend=backend, batching=False)
+            reg.preload(preload)
+            _FORK_REGISTRY = reg
+            self._crops = reg.crops()
+        else:
+            self._crops = ModelRegistry(model_dir, build_model, torch.device("cpu"),
+                                        capacity=capacity, backend=backend, batching=False).crops()
+
+        # 부모 -> 관리 프로세스 (job), 관리 프로세스 -> 부모 (결과/상태)
+        jobs_r, self._jobs = ctx.Pipe(duplex=False)
+        self._results, results_w = ctx.Pipe(duplex=False)
+        self._supervisor = ctx.Process(target=_supervisor_main,
+                                       args=(cfg, num_procs, start_method, jobs_r, results_w,
+                                             (self._jobs, self._results)),
+                                       name="infer-supervisor")
+        self._supervisor.start()
+        # 관리 프로세스가 죽으면 recv가 EOFError를 내도록 부모 쪽 사본은 닫음
+        jobs_r.close()
+        results_w.close()
+
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._ids = itertools.count()
+        self.submitted = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.alive = num_procs
+        self._down = None         # 관리 프로세스가 죽은 이유 (이후 요청은 바로 실패)
+        self._stopping = False
+
+        self._collector = threading.Thread(target=self._collect, name="infer-proc-results", daemon=True)
+        self._collector.start()
+        # 관리 프로세스는 daemon이 아니므로(워커를 띄워야 함) 종료 시 멈춰 둠
+        atexit.register(self.stop)
+
+    def crops(self):
+        return list(self._crops)
+
+    def submit(self, crop, data):
+        """이미지 bytes 예측 요청 -> Future(결과 dict)"""
+        if self._down:
+            raise RuntimeError(self._down)
+        fut = Future()
+        job_id = next(self._ids)
+        fut.job_id = job_id
+        with self._lock:
+            self._pending[job_id] = fut
+            self.submitted += 1
+        try:
+            with self._send_lock:
+                self._jobs.send((job_id, crop, data))
+        except OSError as e:
+            with self._lock:
+                self._pending.pop(job_id, None)
+            raise RuntimeError(f"inference supervisor unavailable: {e}")
+        return fut
+
+    def predict(self, crop, data, timeout=None):
+        """결과 dict: probs, class_ids, class_names, backend
+
+        이미지를 읽을 수 없으면 ValueError, 모델 쪽 오류/워커 종료/시간 초과(timeout, 기본 timeout_s)는 RuntimeError
+        """
+        fut = self.submit(crop, data)
+        try:
+            out = fut.result(timeout=timeout or self.timeout_s)
+        except FutureTimeout:
+            with self._lock:
+                self._pending.pop(fut.job_id, None)
+                self.timeouts += 1
+            raise RuntimeError(f"inference timed out after {timeout or self.timeout_s}s")
+        if "error" in out:
+            raise (ValueError if out.get("bad_image") else RuntimeError)(out["error"])
+        return out
+
+    def stop(self):
+        if self._stopping:
+            return
+        self._stopping = True
+        try:
+            with self._send_lock:
+                self._jobs.send(None)
+        except OSError:
+            pass
+        self._supervisor.join(timeout=10)
+        if self._supervisor.is_alive():
+            self._supervisor.terminate()
+        self._collector.join(timeout=5)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "procs": self.num_procs,
+                "alive": self.alive if not self._down else 0,
+                "start_method": self.start_method,
+                "pending": len(self._pending),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "timeouts": self.timeouts,
+                "crashes": self.crashes,
+                "down": self._down,
+            }
+
+    def _collect(self):
+        while True:
+            try:
+                if not self._results.poll(1.0):
+                    if self._supervisor.is_alive():
+                        continue
+                    raise EOFError
+                item = self._results.recv()
+            except (EOFError, OSError):
+                item = None
+                if not self._stopping:
+                    self._fail_all(f"inference supervisor exited with code {self._supervisor.exitcode}")
+            if item is None:
+                break
+            if item[0] == "status":
+                _, alive, crashes = item
+                with self._lock:
+                    self.alive, self.crashes = alive, crashes
+                continue
+            job_id, out = item
+            with self._lock:
+                fut = self._pending.pop(job_id, None)
+                self.completed += 1
+            if fut is not None:
+                fut.set_result(out)
+
+    def _fail_all(self, reason):
+        """관리 프로세스가 죽으면 기다리는 요청을 모두 실패 처리 (이후 요청도 바로 실패)"""
+        with self._lock:
+            self._down = reason
+            futs, self._pending = list(self._pending.values()), {}
+        print(f"[추론 프로세스] {reason}, 대기 중이던 {len(futs)}건 실패 처리")
+        for fut in futs:
+            fut.set_result({"error": reason})
+
+
+class _Worker:
+    """관리 프로세스 안에서 본 워커 하나 (전용 job 큐 + 결과 파이프 + 보낸 job_id)"""
+
+    def __init__(self, ctx, cfg, i):
+        self.name = f"infer-proc-{i}"
+        self.jobs = ctx.Queue()
+        self.results, results_w = ctx.Pipe(duplex=False)
+        self.inflight = set()
+        self.proc = ctx.Process(target=_worker_main, args=(cfg, self.jobs, results_w),
+                                name=self.name, daemon=True)
+        self.proc.start()
+        # 워커가 죽으면 recv가 EOFError를 내도록 관리 프로세스 쪽 사본은 닫음
+        results_w.close()
+
+    def send(self, item):
+        self.inflight.add(item[0])
+        self.jobs.put(item)
+
+    def drain(self, out):
+        """받은 결과를 부모로 넘김"""
+        while self.results.poll():
+            try:
+                item = self.results.recv()
+            except (EOFError, OSError):
+                return
+            self.inflight.discard(item[0])
+            out.send(item)
+
+    def close(self):
+        self.results.close()
+        self.jobs.close()
+        self.jobs.cancel_join_thread()
+
+
+def _supervisor_main(cfg, num_procs, start_method, jobs, results, parent_ends):
+    """관리 프로세스: job 분배, 결과 전달, 죽은 워커 재시작 (단일 스레드라서 여기서 fork 해도 안전)"""
+    for conn in parent_ends:
+        conn.close()
+    ctx = mp.get_context(start_method)
+    workers = [_Worker(ctx, cfg, i) for i in range(num_procs)]
+    crashes = 0
+    stop = False
+
+    while not stop:
+        ready = wait_ready([jobs] + [w.results for w in workers] + [w.proc.sentinel for w in workers],
+                           timeout=1.0)
+        for w in workers:
+            if w.results in ready:
+                w.drain(results)
+
+        if jobs in ready:
+            while jobs.poll():
+                try:
+                    item = jobs.recv()
+                except (EOFError, OSError):  # 부모 종료
+                    item = None
+                if item is None:
+                    stop = True
+                    break
+                min(workers, key=lambda w: len(w.inflight)).send(item)
+
+        for i, w in enumerate(workers):
+            if w.proc.is_alive():
+                continue
+            w.drain(results)
+            crashes += 1
+            print(f"[추론 프로세스] {w.name} 종료 (exitcode {w.proc.exitcode}), "
+                  f"처리 중이던 {len(w.inflight)}건 실패 처리 후 재시작")
+            for job_id in w.inflight:
+                results.send((job_id, {"error": f"inference worker exited with code {w.proc.exitcode}"}))
+            w.close()
+            workers[i] = _Worker(ctx, cfg, i)
+            results.send(("status", sum(x.proc.is_alive() for x in workers), crashes))
+
+    for w in workers:
+        w.jobs.put(None)
+    for w in workers:
+        w.proc.join(timeout=5)
+        if w.proc.is_alive():
+            w.proc.terminate()
+    try:
+        results.send(None)
+    except OSError:
+        pass
+
+
+def _worker_main(cfg, jobs, results):
+    """워커 프로세스: job을 최대 max_batch개까지 모아 작물별로 한 번에 추론"""
+    torch.set_num_threads(cfg["threads"])
+    registry = _FORK_REGISTRY
+    if registry is None:
+        registry = ModelRegistry(cfg["model_dir"], build_model, torch.device("cpu"),
+                                 capacity=cfg["capacity"], backend=cfg["backend"], batching=False)
+    supervisor = os.getppid()
+    buf = None
+    stop = False
+
+    while not stop:
+        try:
+            item = jobs.get(timeout=5.0)
+        except queue.Empty:
+            if os.getppid() != supervisor:  # 관리 프로세스가 죽음
+                break
+            continue
+        if item is None:
+            break
+        batch = [item]
+        while len(batch) < cfg["max_batch"]:
+            try:
+                item = jobs.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+
+        # 디코딩 (실패한 이미지는 바로 에러 반환)
+        by_crop = {}
+        for job_id, crop, data in batch:
+            try:
+                by_crop.setdefault(crop, []).append((job_id, decode_image(data)))
+            except Exception as e:
+                results.send((job_id, {"error": str(e), "bad_image": True}))
+
+        for crop, items in by_crop.items():
+            try:
+                entry = registry.get(crop)
+                if buf is None or buf.shape[0] < len(items):
+                    buf = torch.empty((max(cfg["max_batch"], len(items)), 3, 224, 224))
+                x = normalize_into(buf, [t for _, t in items])
+                with torch.no_grad():
+                    prob = torch.softmax(entry.model(x), dim=1)
+            except Exception as e:
+                for job_id, _ in items:
+                    results.send((job_id, {"error": str(e)}))
+                continue
+            for i, (job_id, _) in enumerate(items):
+                results.send((job_id, {
+                    "probs": prob[i].tolist(),
+                    "class_ids": entry.class_ids,
+                    "class_names": entry.class_names,
+                    "backend": entry.backend,
+                    "pid": os.getpid(),
+                }))
@@ -0,0 +1,192 @@
+"""EfficientNet 분류 모델 INT8 양자화 (post-training quantization)
+
+사용 예:
+    python quantize_model.py --crop tomato --checkpoint best_tomato_disease_model.pth --data D:\\data_folders
+    python quantize_model.py --crop lettuce --checkpoint best_lettuce_disease_model.pth --mode dynamic
+
+- static : validation 폴더(Deep/data_processing/testtovalidation.py 결과) 이미지로 calibration 후
+           FX graph mode 로 conv/linear 전체를 INT8로 변환
+- dynamic: classifier Linear만 INT8 (calibration 불필요, 속도 이득은 적음)
+
+test 폴더(없으면 validation)로 FP32 / INT8 모델을 각각 평가해서
+클래스별 classification_report와 차이를 출력하고,
+{crop}_disease_model_int8.ts.pt 로 저장한다. 서버에서는 INFER_BACKEND=int8 로 사용.
+"""
+import os
+import json
+import argparse
+
+import numpy as np
+import torch
+import torch.nn as nn
+from PIL import Image
+from torch.utils.data import Dataset, DataLoader
+from torchvision import transforms
+from sklearn.metrics import classification_report
+
+from model_registry import KNOWN_CLASSES, build_model, load_checkpoint
+from infer_backend import artifact_paths
+
+# AI-HUB 라벨링의 annotations.crop 값 (Deep/*_deep.py 의 CROP_DISEASE_MAPPING 과 동일)
+CROP_CODES = {"pepper": '2', "strawberry": '4', "lettuce": '5', "tomato": '11'}
+
+test_transform = transforms.Compose([
+    transforms.Resize((224, 224)),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+])
+
+
+def load_split(base_dir, folder, crop_code, class_ids):
+    """{base_dir}/{folder}/labeling/*.json 에서 해당 작물/질병 이미지만 모은다"""
+    image_dir = os.path.join(base_dir, folder, 'image')
+    label_dir = os.path.join(base_dir, folder, 'labeling')
+    paths, labels = [], []
+    if not os.path.isdir(label_dir):
+        return paths, labels
+
+    for json_file in os.listdir(label_dir):
+        if not json_file.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(label_dir, json_file), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            crop = str(data['annotations']['crop'])
+            disease = str(data['annotations']['disease'])
+            img_path = os.path.join(image_dir, data['description']['image'])
+        except Exception as e:
+            print(f"JSON 파일 처리 오류 {json_file}: {e}")
+            continue
+        if crop == crop_code and disease in class_ids and os.path.exists(img_path):
+            paths.append(img_path)
+            labels.append(class_ids.index(disease))
+    return paths, labels
+
+
+class ImageDataset(Dataset):
+    def __init__(self, paths, labels):
+        self.paths = paths
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, idx):
+        image = Image.open(self.paths[idx]).convert('RGB')
+        return test_transform(image), self.labels[idx]
+
+
+def quantize_static(model, calib_loader, calib_batches, engine):
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    torch.backends.quantized.engine = engine
+    example = (torch.randn(1, 3, 224, 224),)
+    prepared = prepare_fx(model.eval(), get_default_qconfig_mapping(engine), example)
+
+    # calibration: validation 이미지로 activation 범위 수집
+    with torch.no_grad():
+        for i, (inputs, _) in enumerate(calib_loader):
+            if i >= calib_batches:
+                break
+            prepared(inputs)
+    return convert_fx(prepared)
+
+
+def quantize_dynamic(model, engine):
+    torch.backends.quantized.engine = engine
+    return torch.ao.quantization.quantize_dynamic(model.eval(), {nn.Linear}, dtype=torch.qint8)
+
+
+def evaluate(model, loader):
+    y_true, y_pred = [], []
+    with torch.no_grad():
+        for inputs, labels in loader:
+            _, preds = torch.max(model(inputs), 1)
+            y_true.extend(labels.numpy())
+            y_pred.extend(preds.numpy())
+    return y_true, y_pred
+
+
+def model_size_mb(path):
+    return os.path.getsize(path) / (1024 * 1024)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="INT8 post-training quantization")
+    ap.add_argument("--crop", required=True, choices=sorted(CROP_CODES))
+    ap.add_argument("--checkpoint", required=True)
+    ap.add_argument("--data", default='D:\\data_folders', help="train/validation/test 폴더가 있는 경로")
+    ap.add_argument("--out", default=None, help="결과 폴더 (기본: 체크포인트와 같은 폴더)")
+    ap.add_argument("--mode", choices=["static", "dynamic"], default="static")
+    ap.add_argument("--calib-batches", type=int, default=20)
+    ap.add_argument("--engine", default="x86" if "x86" in torch.backends.quantized.supported_engines else "qnnpack")
+    args = ap.parse_args()
+
+    device = torch.device("cpu")
+    out_dir = args.out or os.path.dirname(os.path.abspath(args.checkpoint))
+    class_ids, class_names = KNOWN_CLASSES[args.crop]
+    model, class_ids, class_names = load_checkpoint(args.checkpoint, build_model, device, class_ids, class_names)
+
+    crop_code = CROP_CODES[args.crop]
+    calib = load_split(args.data, 'validation', crop_code, class_ids)
+    evalset = load_split(args.data, 'test', crop_code, class_ids)
+    if not evalset[0]:
+        print("test 데이터가 없어 validation 데이터로 평가합니다.")
+        evalset = calib
+    if not evalset[0] or (args.mode == "static" and not calib[0]):
+        print(f"오류: {args.data} 에서 {args.crop} 데이터를 찾을 수 없습니다.")
+        exit(1)
+    print(f"calibration {len(calib[0])}장, 평가 {len(evalset[0])}장")
+
+    eval_loader = DataLoader(ImageDataset(*evalset), batch_size=32, num_workers=0)
+
+    if args.mode == "static":
+        calib_loader = DataLoader(ImageDataset(*calib), batch_size=32, shuffle=True, num_workers=0)
+        qmodel = quantize_static(model, calib_loader, args.calib_batches, args.engine)
+    else:
+        qmodel = quantize_dynamic(model, args.engine)
+
+    # 클래스별 FP32 / INT8 비교 (tomato_deep.py 의 classification_report 평가와 동일한 방식)
+    names = [class_names.get(c, c) for c in class_ids]
+    labels = list(range(len(class_ids)))
+    fp_true, fp_pred = evaluate(model, eval_loader)
+    q_true, q_pred = evaluate(qmodel, eval_loader)
+    print("\n[FP32] 분류 보고서:")
+    print(classification_report(fp_true, fp_pred, labels=labels, target_names=names, zero_division=0))
+    print("[INT8] 분류 보고서:")
+    print(classification_report(q_true, q_pred, labels=labels, target_names=names, zero_division=0))
+
+    fp_rep = classification_report(fp_true, fp_pred, labels=labels, target_names=names, zero_division=0, output_dict=True)
+    q_rep = classification_report(q_true, q_pred, labels=labels, target_names=names, zero_division=0, output_dict=True)
+    deltas = {}
+    print("클래스별 차이 (INT8 - FP32):")
+    for name in names:
+        d = {k: round(q_rep[name][k] - fp_rep[name][k], 4) for k in ("precision", "recall", "f1-score")}
+        deltas[name] = d
+        print(f"  {name}: precision {d['precision']:+.4f}, recall {d['recall']:+.4f}, f1 {d['f1-score']:+.4f}")
+    fp_acc = float(np.mean(np.array(fp_true) == np.array(fp_pred)))
+    q_acc = float(np.mean(np.array(q_true) == np.array(q_pred)))
+    print(f"정확도: FP32 {fp_acc:.4f} -> INT8 {q_acc:.4f} ({q_acc - fp_acc:+.4f})")
+
+    # TorchScript 로 저장 (서버는 torch.jit.load 로 바로 사용)
+    paths = artifact_paths(out_dir, args.crop)
+    with torch.no_grad():
+        scripted = torch.jit.freeze(torch.jit.trace(qmodel, torch.randn(1, 3, 224, 224)).eval())
+    scripted.save(paths["int8"])
+    print(f"저장: {paths['int8']} ({model_size_mb(paths['int8']):.1f} MB, 원본 {model_size_mb(args.checkpoint):.1f} MB)")
+
+    meta = {}
+    if os.path.exists(paths["meta"]):
+        with open(paths["meta"], "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    meta.update({"crop": args.crop, "class_ids": class_ids, "class_names": class_names,
+                 "source": os.path.abspath(args.checkpoint)})
+    meta["int8"] = {"mode": args.mode, "engine": args.engine,
+                    "accuracy_fp32": fp_acc, "accuracy_int8": q_acc, "per_class_delta": deltas}
+    with open(paths["meta"], "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""오래된 센서/로그/업로드 행 보관 정리
+
+기존 DB(auto_vacuum=NONE)를 incremental 모드로 바꾸는 VACUUM은 DB 전체를 다시 쓰면서
+쓰기 잠금을 계속 잡으므로 서버 안에서 하지 않는다. 서버를 멈춘 뒤 한 번만:
+    python retention.py convert sensor_server.db cam_server.db
+"""
+import os
+import sys
+import csv
+import sqlite3
+import gzip
+import time
+import datetime
+import threading
+
+TEXT_FMT = "%Y-%m-%d %H:%M:%S"
+
+
+class RetentionPolicy:
+    """테이블 하나의 보관 규칙
+
+    time_col 값이 window_s보다 오래된 행은 보관 파일로 옮기고 DB에서 지운다.
+    epoch=True 이면 time_col이 정수 epoch 초, 아니면 "%Y-%m-%d %H:%M:%S" 문자열.
+    """
+
+    def __init__(self, db, table, time_col, window_s, epoch=False):
+        self.db = db
+        self.table = table
+        self.time_col = time_col
+        self.window_s = window_s
+        self.epoch = epoch
+        self.archived = 0
+        self.files = set()
+
+    @property
+    def name(self):
+        return f"{os.path.splitext(os.path.basename(self.db.path))[0]}.{self.table}"
+
+    def cutoff(self, now):
+        t = now - self.window_s
+        if self.epoch:
+            return int(t)
+        return datetime.datetime.fromtimestamp(t).strftime(TEXT_FMT)
+
+    def day(self, value):
+        """행의 시간 값 -> 보관 파일 이름에 쓰는 날짜 (YYYY-MM-DD)"""
+        if self.epoch:
+            return datetime.date.fromtimestamp(value).isoformat()
+        return str(value)[:10]
+
+
+class RetentionManager:
+    """오래된 원본 행을 날짜별 압축 파일로 옮기는 백그라운드 관리자
+
+    - archive_dir/{db 이름}/{테이블}/{YYYY-MM-DD}.csv.gz 에 gzip CSV로 추가 기록
+      (gzip 멤버를 이어 붙이므로 gzip.open으로 하루치를 한 번에 읽을 수 있음)
+    - batch_rows개씩 "파일 기록 -> 짧은 트랜잭션으로 삭제"를 반복해서 쓰기 잠금을 오래 잡지 않음
+    - 삭제로 생긴 빈 페이지는 PRAGMA incremental_vacuum으로 vacuum_pages씩 돌려줌
+      (auto_vacuum=INCREMENTAL이 아닌 기존 DB는 건너뜀, 맨 위 설명의 convert로 오프라인 전환)
+    - 롤업 테이블(sensor_rollups)은 정책에 넣지 않으므로 계속 보관
+    """
+
+    def __init__(self, archive_dir, interval_s=3600, batch_rows=500, pause_s=0.05,
+                 vacuum_pages=256, start_delay_s=60):
+        self.archive_dir = archive_dir
+        self.interval_s = interval_s
+        self.batch_rows = batch_rows
+        self.pause_s = pause_s
+        self.vacuum_pages = vacuum_pages
+        self.start_delay_s = start_delay_s
+        self.policies = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._run_lock = threading.Lock()
+
+        self.runs = 0
+        self.last_run = None
+        self.last_run_ms = 0.0
+        self.vacuumed_pages = 0
+        self.errors = 0
+        self._not_incremental = set()  # 경고를 이미 출력한 DB 경로
+
+    def add(self, db, table, time_col, window_days, epoch=False):
+        """window_days <= 0 이면 해당 테이블은 정리하지 않음"""
+        if window_days > 0:
+            self.policies.append(RetentionPolicy(db, table, time_col, window_days * 86400, epoch))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+
+    def _databases(self):
+        dbs = []
+        for p in self.policies:
+            if p.db not in dbs:
+                dbs.append(p.db)
+        return dbs
+
+    def is_incremental(self, db):
+        with db.connection() as conn:
+            return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+    def run_once(self, now=None):
+        """모든 정책을 한 번 실행 (옮긴 행 수 반환)"""
+        now = now or time.time()
+        with self._run_lock:
+            t0 = time.perf_counter()
+            moved = 0
+            for policy in self.policies:
+                try:
+                    moved += self._archive(policy, policy.cutoff(now))
+                except Exception as e:
+                    self.errors += 1
+                    print(f"[보관 정리 오류] {policy.name}: {e}")
+            for db in self._databases():
+                try:
+                    self._vacuum(db)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"[보관 정리 오류] {db.path} incremental_vacuum: {e}")
+            self.runs += 1
+            self.last_run = datetime.datetime.now().strftime(TEXT_FMT)
+            self.last_run_ms = round((time.perf_counter() - t0) * 1000, 2)
+            if moved:
+                print(f"[보관 정리] {moved}행 보관 파일로 이동 ({self.last_run_ms}ms)")
+            return moved
+
+    def _archive(self, policy, cutoff):
+        moved = 0
+        sql = (f"SELECT rowid, * FROM {policy.table} WHERE {policy.time_col} < ? "
+               f"ORDER BY {policy.time_col} LIMIT ?")
+        while not self._stop.is_set():
+            with policy.db.connection() as conn:
+                cur = conn.execute(sql, (cutoff, self.batch_rows))
+                rows = cur.fetchall()
+                columns = [d[0] for d in cur.description][1:]
+            if not rows:
+                break
+            time_idx = columns.index(policy.time_col)
+
+            by_day = {}
+            for row in rows:
+                by_day.setdefault(policy.day(row[1 + time_idx]), []).append(row[1:])
+            # 파일에 먼저 기록한 뒤 삭제 (중간에 죽으면 다음 실행에서 같은 행이 한 번 더 기록될 수는 있어도 유실은 없음)
+            for day, day_rows in by_day.items():
+                self._append(policy, day, columns, day_rows)
+
+            with policy.db.transaction() as conn:
+                conn.executemany(f"DELETE FROM {policy.table} WHERE rowid = ?", [(r[0],) for r in rows])
+            moved += len(rows)
+            policy.archived += len(rows)
+            if len(rows) < self.batch_rows:
+                break
+            # 다른 쓰기가 끼어들 수 있도록 배치 사이에 잠깐 쉼
+            self._stop.wait(self.pause_s)
+        return moved
+
+    def _append(self, policy, day, columns, rows):
+        dbname, table = policy.name.split(".", 1)
+        folder = os.path.join(self.archive_dir, dbname, table)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{day}.csv.gz")
+        new = not os.path.exists(path)
+        with gzip.open(path, "at", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            if new:
+                writer.writerow(columns)
+            writer.writerows(rows)
+        policy.files.add(path)
+
+    def _vacuum(self, db):
+        if not self.is_incremental(db):
+            # 여기서 VACUUM으로 전환하면 DB 전체를 다시 쓰는 동안 모든 쓰기가 막힘
+            if db.path not in self._not_incremental:
+                self._not_incremental.add(db.path)
+                print(f"[보관 정리] {db.path}: auto_vacuum=INCREMENTAL이 아니라서 빈 페이지 반환 생략 "
+                      f"(서버를 멈추고 python retention.py convert {db.path})")
+            return
+        with db.connection() as conn:
+            while not self._stop.is_set():
+                free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if free == 0:
+                    break
+                # execute()는 한 번만 step해서 1페이지만 반환되므로 끝까지 실행되는 executescript 사용
+                conn.executescript(f"PRAGMA incremental_vacuum({self.vacuum_pages})")
+                self.vacuumed_pages += free - conn.execute("PRAGMA freelist_count").fetchone()[0]
+                self._stop.wait(self.pause_s)
+
+    def db_size(self, db):
+        with db.connection() as conn:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            pages = conn.execute("PRAGMA page_count").fetchone()[0]
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return {"bytes": page_size * pages, "free_pages": free, "incremental": self.is_incremental(db)}
+
+    def stats(self):
+        return {
+            "runs": self.runs,
+            "last_run": self.last_run,
+            "last_run_ms": self.last_run_ms,
+            "vacuumed_pages": self.vacuumed_pages,
+            "errors": self.errors,
+            "policies": {p.name: {"window_days": p.window_s / 86400, "archived": p.archived,
+                                  "files": len(p.files)} for p in self.policies},
+            "databases": {db.path: self.db_size(db) for db in self._databases()},
+        }
+
+    def _loop(self):
+        if self._stop.wait(self.start_delay_s):
+            return
+        while not self._stop.is_set():
+            self.run_once()
+            if self._stop.wait(self.interval_s):
+                break
+
+
+def convert_incremental(path):
+    """기존 DB를 auto_vacuum=INCREMENTAL로 전환 (전체 VACUUM, 서버를 멈춘 상태에서만)"""
+    conn = sqlite3.connect(path)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        return True
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "convert":
+        sys.exit("사용법: python retention.py convert DB파일 [DB파일 ...]")
+    for path in sys.argv[2:]:
+        t0 = time.perf_counter()
+        done = convert_incremental(path)
+        print(f"{path}: {'전환 완료' if done else '이미 INCREMENTAL'} ({time.perf_counter() - t0:.1f}s)")
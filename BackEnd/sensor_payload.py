@@ -0,0 +1,133 @@
+"""ESP32 센서 업로드 본문 파서
+
+세 가지 형식을 본문 첫 바이트로 구분해서 받는다 (모두 여러 건을 한 번에 보낼 수 있음).
+
+1. 바이너리 v1 (Content-Type 상관없음, 첫 바이트 = 버전 0x01)
+   13바이트 고정 레코드를 이어 붙인 것, little endian:
+       B  version   1
+       B  flags     bit0 = LED 핀 값, bit1 = FAN 핀 값
+       I  ts        장치 시각 (unix 초, 0이면 서버 수신 시각)
+       h  temp      온도 x10 (°C)
+       H  hum       습도 x10 (%)
+       B  soil      토양습도 (%)
+       H  water     물수위 x10 (%)
+   numpy 구조체 배열로 한 번에 읽어서 변환한다 (레코드 수와 상관없이 파이썬 루프는 결과 dict 만들 때만).
+
+2. 압축 텍스트 (key=value, 한 줄에 한 건)
+       t=23.5&h=45.2&s=40&w=80.1&l=0&f=1[&ts=1700000000][&v=1]
+
+3. 기존 텍스트 (줄 순서 고정: 온도/습도/토양습도/물수위/LED/FAN)
+       Temp: 23.5C\\nHumidity: 45.2%\\n...   또는   온도: 23 C\\n습도: 45 %\\n...
+
+LED/FAN은 핀 값 그대로 보내고 서버에서 1 -> "OFF", 0 -> "ON" (릴레이가 반전되어 있음).
+"""
+import time
+
+import numpy as np
+
+from ingest import BadUpload
+
+BINARY_V1 = 1
+RECORD_V1 = np.dtype([
+    ("version", "u1"),
+    ("flags", "u1"),
+    ("ts", "<u4"),
+    ("temp", "<i2"),
+    ("hum", "<u2"),
+    ("soil", "u1"),
+    ("water", "<u2"),
+])  # itemsize 13 (패딩 없음)
+
+# 압축 텍스트 키 -> 필드
+KV_KEYS = {
+    "t": "temperature",
+    "h": "humidity",
+    "s": "soil_moisture",
+    "w": "water_level",
+    "l": "led_state",
+    "f": "fan_state",
+}
+# 기존 텍스트의 줄 순서
+LEGACY_ORDER = ("temperature", "humidity", "soil_moisture", "water_level", "led_state", "fan_state")
+_UNIT_CHARS = " \t\rC%°"
+
+MAX_CLOCK_SKEW_S = 300  # 장치 시각이 이보다 미래면 서버 시각 사용
+
+
+def switch_state(pin):
+    return "OFF" if int(pin) == 1 else "ON"
+
+
+def _reading(temp, hum, soil, water, led, fan):
+    return {
+        "temperature": float(temp),
+        "humidity": float(hum),
+        "soil_moisture": int(soil),
+        "water_level": float(water),
+        "led_state": switch_state(led),
+        "fan_state": switch_state(fan),
+    }
+
+
+def _device_ts(ts, now):
+    return ts if 0 < ts <= now + MAX_CLOCK_SKEW_S else now
+
+
+def parse_binary(body, now):
+    if len(body) % RECORD_V1.itemsize:
+        raise BadUpload(f"binary sensor payload must be a multiple of {RECORD_V1.itemsize} bytes")
+    rec = np.frombuffer(body, dtype=RECORD_V1)
+    if (rec["version"] != BINARY_V1).any():
+        raise BadUpload("unsupported sensor payload version")
+    temp = rec["temp"] / 10.0
+    hum = rec["hum"] / 10.0
+    water = rec["water"] / 10.0
+    led = rec["flags"] & 1
+    fan = (rec["flags"] >> 1) & 1
+    ts = np.where((rec["ts"] > 0) & (rec["ts"] <= now + MAX_CLOCK_SKEW_S), rec["ts"], int(now))
+    return [
+        (float(t), _reading(*row))
+        for t, *row in zip(ts.tolist(), temp.tolist(), hum.tolist(), rec["soil"].tolist(),
+                           water.tolist(), led.tolist(), fan.tolist())
+    ]
+
+
+def parse_kv(text, now):
+    out = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        values = dict(pair.partition("=")[::2] for pair in line.strip().split("&"))
+        try:
+            reading = _reading(*(values[k] for k in KV_KEYS))
+            ts = _device_ts(int(values.get("ts") or 0), now)
+        except KeyError as e:
+            raise BadUpload(f"missing sensor field {e.args[0]!r}")
+        out.append((ts, reading))
+    return out
+
+
+def parse_legacy(text, now):
+    lines = [line for line in text.strip().splitlines() if line.strip()]
+    if len(lines) < len(LEGACY_ORDER):
+        raise BadUpload(f"expected {len(LEGACY_ORDER)} sensor lines, got {len(lines)}")
+    values = [line.partition(":")[2].strip(_UNIT_CHARS) for line in lines[:len(LEGACY_ORDER)]]
+    return [(now, _reading(*values))]
+
+
+def parse(body, now=None):
+    """본문 bytes -> (형식 이름, [(시각, 센서값 dict), ...])"""
+    now = now or time.time()
+    if not body:
+        raise BadUpload("empty sensor payload")
+    try:
+        if body[0] == BINARY_V1:
+            return "binary", parse_binary(body, now)
+        text = body.decode("utf-8", errors="replace")
+        if ":" in text:
+            return "text", parse_legacy(text, now)
+        return "kv", parse_kv(text, now)
+    except BadUpload:
+        raise
+    except ValueError as e:  # 숫자 변환 실패
+        raise BadUpload(f"bad sensor value: {e}")
@@ -0,0 +1,64 @@
+import time
+import datetime
+import threading
+
+FIELDS = ("temperature", "humidity", "soil_moisture", "water_level", "led_state", "fan_state")
+
+
+def empty_state():
+    """아직 데이터가 없을 때 돌려줄 기본값 (프론트엔드가 기대하는 키 그대로)"""
+    state = {f: None for f in FIELDS}
+    state["timestamp"] = None
+    return state
+
+
+class SensorStateStore:
+    """장치별 최신 센서값 (?id=ESP32-xxx 별로 따로 보관)
+
+    업로드 스레드들이 동시에 갱신해도 섞이지 않도록 장치 하나의 값 전체를
+    새 dict로 만들어서 한 번에 교체하고, 조회는 dict 한 번 찾기로 끝난다.
+    """
+
+    def __init__(self):
+        self._states = {}      # device_id -> 최신 값 dict (교체만 하고 수정하지 않음)
+        self._latest = None    # 가장 최근에 갱신된 device_id
+        self._lock = threading.Lock()
+        self.updates = 0
+
+    def update(self, device_id, values, ts=None):
+        ts = ts or time.time()
+        state = {f: values.get(f) for f in FIELDS}
+        state["device_id"] = device_id
+        state["timestamp"] = datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+        state["ts"] = int(ts)
+        with self._lock:
+            self._states[device_id] = state
+            self._latest = device_id
+            self.updates += 1
+        return state
+
+    def get(self, device_id=None):
+        """device_id가 없으면 가장 최근에 들어온 장치의 값 (기존 /api/sensor 동작)"""
+        with self._lock:
+            if device_id is None:
+                device_id = self._latest
+            state = self._states.get(device_id)
+        return dict(state) if state else None
+
+    def all(self):
+        with self._lock:
+            return {d: dict(s) for d, s in self._states.items()}
+
+    def devices(self):
+        with self._lock:
+            return sorted(self._states)
+
+    def load(self, db):
+        """재시작 후 sensor_readings에서 장치별 마지막 값 복구"""
+        rows = db.query(f"""
+            SELECT device_id, max(ts), {', '.join(FIELDS)}
+            FROM sensor_readings GROUP BY device_id ORDER BY max(ts)
+        """)
+        for row in rows:
+            self.update(row[0], dict(zip(FIELDS, row[2:])), ts=row[1])
+        return len(rows)
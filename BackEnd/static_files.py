@@ -0,0 +1,217 @@
+"""FrontEnd/dist 정적 파일 색인 + 미리 압축
+
+빌드 후 미리 압축해 두려면:  python static_files.py [dist 폴더]
+(서버 시작 시에도 .br/.gz가 없으면 만들어 둔다)
+"""
+import os
+import re
+import sys
+import gzip
+import time
+import hashlib
+import mimetypes
+import threading
+
+try:
+    import brotli
+except ImportError:  # brotli가 없으면 gzip만 사용 (미리 만들어 둔 .br 파일은 그대로 서빙)
+    brotli = None
+
+IMMUTABLE_MAX_AGE = 365 * 86400  # 이름에 해시가 들어간 Vite 빌드 파일
+# Vite 빌드 파일 이름: assets/index-B3x9_aZk.js, assets/logo-4bXq1f2e.svg
+HASHED_NAME = re.compile(r"-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+
+# 압축할 파일 (이미지/폰트처럼 이미 압축된 형식은 제외)
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "application/xml",
+                "image/svg+xml", "application/wasm", "application/manifest+json")
+MIN_COMPRESS_BYTES = 1024
+# 선호 순서: Accept-Encoding에 둘 다 있으면 br
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def compressible(mimetype, size):
+    return size >= MIN_COMPRESS_BYTES and mimetype.startswith(COMPRESSIBLE)
+
+
+def compress(encoding, data):
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(data, quality=11)
+    return None
+
+
+class StaticFile:
+    """dist 파일 하나 (작은 파일은 내용까지 메모리에)"""
+
+    __slots__ = ("rel", "path", "data", "size", "mtime", "etag", "mimetype", "immutable", "encoded")
+
+    def __init__(self, rel, path, data, size, mtime, etag, mimetype, immutable):
+        self.rel = rel
+        self.path = path
+        self.data = data
+        self.size = size
+        self.mtime = mtime
+        self.etag = etag
+        self.mimetype = mimetype
+        self.immutable = immutable
+        self.encoded = {}  # "br"/"gzip" -> 미리 압축한 StaticFile (.br/.gz 파일)
+
+    @property
+    def vary(self):
+        """압축본이 있으면 Accept-Encoding에 따라 응답이 달라짐"""
+        return bool(self.encoded)
+
+    def negotiate(self, accept):
+        """accept: 인코딩 -> q 값 (request.accept_encodings) -> (Content-Encoding 또는 None, 보낼 파일)"""
+        for encoding, _ in ENCODINGS:
+            variant = self.encoded.get(encoding)
+            if variant is not None and accept[encoding] > 0:
+                return encoding, variant
+        return None, self
+
+    @property
+    def cache_control(self):
+        # 해시 이름 파일은 내용이 바뀌면 이름도 바뀌므로 영구 캐시, 나머지(index.html 등)는 매번 ETag로 확인
+        if self.immutable:
+            return f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        return "no-cache"
+
+
+class StaticIndex:
+    """FrontEnd/dist 메모리 색인
+
+    시작할 때 dist를 한 번 훑어서 경로 -> 파일 정보(강한 ETag = 내용 해시, MIME, 캐시 정책)를 만든다.
+    요청마다 os.path.exists/stat 하지 않고 dict 조회만 하며, SPA 경로(없는 파일)는 바로 index.html.
+    다시 빌드했을 때를 위해 check_s초에 한 번만 dist 폴더 mtime을 확인해서 바뀌었으면 다시 색인한다.
+    """
+
+    def __init__(self, root, index="index.html", check_s=5.0, max_mem_bytes=2 * 1024 * 1024):
+        self.root = root
+        self.index = index
+        self.check_s = check_s
+        self.max_mem_bytes = max_mem_bytes
+        self._files = {}
+        self._root_mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.hits = 0
+        self.fallbacks = 0
+
+    def build(self):
+        paths = {}
+        if os.path.isdir(self.root):
+            for dirpath, _, filenames in os.walk(self.root):
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    paths[os.path.relpath(path, self.root).replace(os.sep, "/")] = path
+
+        files = {}
+        for rel, path in paths.items():
+            # x.js.br / x.js.gz 는 x.js의 압축본으로 붙이고 따로 색인하지 않음
+            if any(rel.endswith(ext) and rel[:-len(ext)] in paths for _, ext in ENCODINGS):
+                continue
+            entry = self._load(rel, path)
+            if compressible(entry.mimetype, entry.size):
+                self._attach_encoded(entry, paths)
+            files[rel] = entry
+        with self._lock:
+            self._files = files
+            self._root_mtime = self._dir_mtime()
+            self._checked_at = time.monotonic()
+            self.builds += 1
+        return len(files)
+
+    def _attach_encoded(self, entry, paths):
+        """.br/.gz 압축본 연결 (없으면 만들어서 dist에 저장, 쓸 수 없는 폴더면 메모리에만)"""
+        for encoding, ext in ENCODINGS:
+            path = entry.path + ext
+            if entry.rel + ext in paths and os.path.getmtime(path) >= entry.mtime:
+                variant = self._load(entry.rel, path)
+            else:
+                data = entry.data
+                if data is None:
+                    with open(entry.path, "rb") as f:
+                        data = f.read()
+                packed = compress(encoding, data)
+                if packed is None or len(packed) >= entry.size * 0.95:
+                    continue  # 압축 효과가 없으면 원본만
+                try:
+                    with open(path + ".part", "wb") as f:
+                        f.write(packed)
+                    os.replace(path + ".part", path)
+                except OSError:  # dist가 읽기 전용이면 메모리에만
+                    if os.path.exists(path + ".part"):
+                        os.remove(path + ".part")
+                    path = None
+                variant = StaticFile(entry.rel, path, packed, len(packed), entry.mtime,
+                                     hashlib.blake2b(packed, digest_size=16).hexdigest(),
+                                     entry.mimetype, entry.immutable)
+            variant.mimetype = entry.mimetype  # .gz의 MIME이 아니라 원본 형식으로 응답
+            variant.immutable = entry.immutable
+            entry.encoded[encoding] = variant
+
+    def _load(self, rel, path):
+        st = os.stat(path)
+        h = hashlib.blake2b(digest_size=16)
+        data = None
+        with open(path, "rb") as f:
+            if st.st_size <= self.max_mem_bytes:
+                data = f.read()
+                h.update(data)
+            else:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    h.update(chunk)
+        mimetype = mimetypes.guess_type(rel)[0] or "application/octet-stream"
+        immutable = rel.startswith("assets/") and bool(HASHED_NAME.search(rel))
+        # 같은 내용이라도 압축본은 다른 bytes이므로 ETag도 달라야 함 (내용 해시라 자동으로 다름)
+        return StaticFile(rel, path, data, st.st_size, st.st_mtime, h.hexdigest(), mimetype, immutable)
+
+    def _dir_mtime(self):
+        try:
+            return (os.stat(self.root).st_mtime_ns,
+                    os.stat(os.path.join(self.root, self.index)).st_mtime_ns)
+        except OSError:
+            return None
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_s:
+            return
+        self._checked_at = now
+        if self._dir_mtime() != self._root_mtime:
+            self.build()
+
+    def lookup(self, rel):
+        """경로 -> StaticFile (없으면 SPA용 index.html, dist가 없으면 None)"""
+        self._maybe_refresh()
+        with self._lock:
+            entry = self._files.get(rel)
+            if entry is not None:
+                self.hits += 1
+                return entry
+            self.fallbacks += 1
+            return self._files.get(self.index)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "root": self.root,
+                "files": len(self._files),
+                "bytes_in_memory": sum(len(v.data) for e in self._files.values()
+                                       for v in (e, *e.encoded.values()) if v.data is not None),
+                "precompressed": {enc: sum(1 for e in self._files.values() if enc in e.encoded)
+                                  for enc, _ in ENCODINGS},
+                "brotli": brotli is not None,
+                "builds": self.builds,
+                "hits": self.hits,
+                "fallbacks": self.fallbacks,
+            }
+
+
+if __name__ == "__main__":
+    root = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "..", "FrontEnd", "dist")
+    index = StaticIndex(os.path.abspath(root))
+    index.build()
+    print(index.stats())
@@ -0,0 +1,48 @@
+import os
+import re
+import datetime
+import itertools
+import threading
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_-]+")
+
+
+class UploadStore:
+    """업로드 파일 저장 위치 관리
+
+    root/YYYY/MM/DD/{장치ID}_{YYYYmmdd_HHMMSS}_{순번}{확장자}
+    - 날짜별 하위 폴더라서 한 폴더의 파일 수가 하루치로 제한됨 (목록/파일 찾기가 빠름)
+    - 이름은 O_EXCL로 빈 파일을 먼저 만들어서 예약하므로, 같은 초에 여러 장치/요청이 올려도
+      (다른 프로세스나 재시작 후라도) 서로 덮어쓰지 않는다
+    - DB에는 root 기준 상대 경로(rel_path)를 저장하고 URL은 /uploads/{rel_path}
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+        self.collisions = 0
+
+    def reserve(self, device_id, ext=".jpg", suffix="", now=None):
+        """새 파일 이름 예약 -> 절대 경로 (빈 파일이 만들어진 상태)"""
+        now = now or datetime.datetime.now()
+        folder = os.path.join(self.root, now.strftime("%Y"), now.strftime("%m"), now.strftime("%d"))
+        os.makedirs(folder, exist_ok=True)
+        device = _UNSAFE.sub("_", device_id or "UNKNOWN")
+        stamp = now.strftime("%Y%m%d_%H%M%S")
+        while True:
+            with self._lock:
+                seq = next(self._seq)
+            path = os.path.join(folder, f"{device}_{stamp}_{seq:06d}{suffix}{ext}")
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+                return path
+            except FileExistsError:
+                self.collisions += 1
+
+    def rel_path(self, path):
+        return os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    def url(self, file_path, rel_path=None):
+        """uploads 행 -> 브라우저용 URL (rel_path가 없는 예전 행은 파일 이름만)"""
+        return f"/uploads/{rel_path or os.path.basename(file_path)}"
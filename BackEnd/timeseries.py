@@ -0,0 +1,211 @@
+import time
+import datetime
+
+METRICS = ("temperature", "humidity", "soil_moisture", "water_level")
+
+# 롤업 해상도 (초)
+RESOLUTIONS = {"1m": 60, "1h": 3600, "1d": 86400}
+MAX_POINTS = 1000  # resolution=auto 일 때 한 번에 돌려줄 최대 점 개수
+RAW_MAX_SPAN = 6 * 3600  # 이보다 짧은 기간은 원본 그대로
+
+SQL_INSERT_READING = """
+    INSERT INTO sensor_readings (device_id, ts, temperature, humidity, soil_moisture, water_level, led_state, fan_state)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# 버킷이 이미 있으면 n/합계/최소/최대만 갱신 (NULL 값은 무시)
+SQL_UPSERT_ROLLUP = """
+    INSERT INTO sensor_rollups (resolution, device_id, bucket, n, {cols})
+    VALUES (?, ?, ?, 1, {marks})
+    ON CONFLICT(resolution, device_id, bucket) DO UPDATE SET
+        n = n + 1, {updates}
+""".format(
+    cols=", ".join(f"{m}_min, {m}_max, {m}_sum" for m in METRICS),
+    marks=", ".join("?, ?, ?" for _ in METRICS),
+    updates=", ".join(
+        f"{m}_min = coalesce(min({m}_min, excluded.{m}_min), {m}_min, excluded.{m}_min), "
+        f"{m}_max = coalesce(max({m}_max, excluded.{m}_max), {m}_max, excluded.{m}_max), "
+        f"{m}_sum = coalesce({m}_sum + excluded.{m}_sum, {m}_sum, excluded.{m}_sum)"
+        for m in METRICS),
+)
+
+
+def init_tables(conn):
+    """원본(정수 epoch 시간 + 장치/시간 인덱스) 테이블과 롤업 테이블 생성"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sensor_readings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            device_id TEXT NOT NULL,
+            ts INTEGER NOT NULL,
+            temperature REAL,
+            humidity REAL,
+            soil_moisture REAL,
+            water_level REAL,
+            led_state TEXT,
+            fan_state TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_readings_device_ts ON sensor_readings (device_id, ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_readings_ts ON sensor_readings (ts)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sensor_rollups (
+            resolution INTEGER NOT NULL,
+            device_id TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            n INTEGER NOT NULL,
+            {cols},
+            PRIMARY KEY (resolution, device_id, bucket)
+        ) WITHOUT ROWID
+    """.format(cols=", ".join(f"{m}_min REAL, {m}_max REAL, {m}_sum REAL" for m in METRICS)))
+
+
+LEGACY_MIGRATED = 1  # sensor_server.db PRAGMA user_version: sensor_data 이전 완료
+
+
+def migrate_legacy(conn):
+    """기존 sensor_data(TEXT 시간) 행을 sensor_readings로 옮기고 롤업 계산 (처음 한 번만)
+
+    한 번 했는지는 PRAGMA user_version으로 기록한다. retention이 sensor_readings를 비울 수 있으므로
+    "sensor_readings가 비어 있음"을 기준으로 삼으면 안 됨 (다시 가져오면서 롤업을 덮어씀).
+    """
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= LEGACY_MIGRATED:
+        return 0
+    has_legacy = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='sensor_data'").fetchone()
+    # 표시가 생기기 전 버전에서 이미 이전한 DB: 원본이나 롤업(영구 보관)이 남아 있음
+    migrated = (conn.execute("SELECT 1 FROM sensor_readings LIMIT 1").fetchone()
+                or conn.execute("SELECT 1 FROM sensor_rollups LIMIT 1").fetchone())
+    if not has_legacy or migrated:
+        conn.execute(f"PRAGMA user_version = {LEGACY_MIGRATED}")
+        return 0
+    cols = {row[1] for row in conn.execute("PRAGMA table_info(sensor_data)")}
+    led = "led_state" if "led_state" in cols else "NULL"
+    fan = "fan_state" if "fan_state" in cols else "NULL"
+    cur = conn.execute(f"""
+        INSERT INTO sensor_readings (device_id, ts, temperature, humidity, soil_moisture, water_level, led_state, fan_state)
+        SELECT 'UNKNOWN', CAST(strftime('%s', timestamp, 'utc') AS INTEGER),
+               temperature, humidity, soil_moisture, water_level, {led}, {fan}
+        FROM sensor_data WHERE timestamp IS NOT NULL ORDER BY id
+    """)
+    rebuild_rollups(conn, device_id="UNKNOWN")
+    conn.execute(f"PRAGMA user_version = {LEGACY_MIGRATED}")
+    return cur.rowcount
+
+
+def rebuild_rollups(conn, since=None, device_id=None):
+    """원본 데이터에서 롤업 다시 계산 (since 이후 버킷만, device_id가 있으면 그 장치만)
+
+    원본이 retention으로 지워진 기간의 롤업은 다시 만들 수 없으므로 since 없이 부를 때는 주의
+    """
+    for res in RESOLUTIONS.values():
+        rollup_where, reading_where, params = ["resolution = ?"], [], []
+        if since is not None:
+            rollup_where.append("bucket >= ?")
+            reading_where.append("ts >= ?")
+            params.append(since - since % res)
+        if device_id is not None:
+            rollup_where.append("device_id = ?")
+            reading_where.append("device_id = ?")
+            params.append(device_id)
+        conn.execute(f"DELETE FROM sensor_rollups WHERE {' AND '.join(rollup_where)}", (res, *params))
+        where = f"WHERE {' AND '.join(reading_where)}" if reading_where else ""
+        aggs = ", ".join(f"min({m}), max({m}), sum({m})" for m in METRICS)
+        cols = ", ".join(f"{m}_min, {m}_max, {m}_sum" for m in METRICS)
+        conn.execute(f"""
+            INSERT INTO sensor_rollups (resolution, device_id, bucket, n, {cols})
+            SELECT ?, device_id, (ts / ?) * ?, count(*), {aggs}
+            FROM sensor_readings {where}
+            GROUP BY device_id, ts / {res}
+        """, (res, res, res, *params))
+
+
+def auto_resolution(span):
+    """기간 길이에 맞는 해상도: 짧으면 원본, 아니면 점 개수가 MAX_POINTS 이하인 가장 촘촘한 롤업"""
+    if span <= RAW_MAX_SPAN:
+        return "raw"
+    for name, res in RESOLUTIONS.items():
+        if span / res <= MAX_POINTS:
+            return name
+    return "1d"
+
+
+def parse_time(value, default=None):
+    """epoch 초(정수) 또는 ISO 형식 문자열 -> epoch 초"""
+    if value is None or value == "":
+        return default
+    try:
+        return int(float(value))
+    except ValueError:
+        return int(datetime.datetime.fromisoformat(value).timestamp())
+
+
+class SensorTimeSeries:
+    """센서 시계열 저장소 (원본 + 1분/1시간/1일 롤업)
+
+    기록은 WriteBehindBuffer로 모아서 하고, 조회는 요청한 기간과 해상도에 맞는
+    롤업 테이블만 읽어서 몇 주치 데이터도 원본 행을 훑지 않는다.
+    """
+
+    def __init__(self, db, writes):
+        self.db = db
+        self.writes = writes
+
+    def add(self, device_id, values, ts=None):
+        """values: temperature/humidity/soil_moisture/water_level/led_state/fan_state"""
+        ts = int(ts if ts is not None else time.time())
+        self.writes.add(SQL_INSERT_READING, (
+            device_id, ts,
+            values.get("temperature"), values.get("humidity"),
+            values.get("soil_moisture"), values.get("water_level"),
+            values.get("led_state"), values.get("fan_state"),
+        ))
+        stats = []
+        for m in METRICS:
+            v = values.get(m)
+            stats.extend((v, v, v))
+        for res in RESOLUTIONS.values():
+            self.writes.add(SQL_UPSERT_ROLLUP, (res, device_id, ts - ts % res, *stats))
+
+    def query(self, start, end, resolution="auto", device_id=None):
+        """[start, end) 기간 조회 -> (실제 해상도, 점 목록)"""
+        if resolution == "auto":
+            resolution = auto_resolution(end - start)
+
+        if resolution == "raw":
+            return "raw", self._query_raw(start, end, device_id)
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution must be one of raw, auto, {', '.join(RESOLUTIONS)}")
+        return resolution, self._query_rollup(RESOLUTIONS[resolution], start, end, device_id)
+
+    def _query_raw(self, start, end, device_id):
+        sql = f"SELECT device_id, ts, {', '.join(METRICS)}, led_state, fan_state FROM sensor_readings WHERE ts >= ? AND ts < ?"
+        params = [start, end]
+        if device_id:
+            sql += " AND device_id = ?"
+            params.append(device_id)
+        sql += " ORDER BY ts LIMIT ?"
+        params.append(MAX_POINTS * 10)
+        points = []
+        for row in self.db.query(sql, params):
+            p = {"device_id": row[0], "t": row[1]}
+            p.update(zip(METRICS, row[2:2 + len(METRICS)]))
+            p["led_state"], p["fan_state"] = row[-2], row[-1]
+            points.append(p)
+        return points
+
+    def _query_rollup(self, res, start, end, device_id):
+        cols = ", ".join(f"{m}_min, {m}_max, {m}_sum" for m in METRICS)
+        sql = f"SELECT device_id, bucket, n, {cols} FROM sensor_rollups WHERE resolution = ? AND bucket >= ? AND bucket < ?"
+        params = [res, start - start % res, end]
+        if device_id:
+            sql += " AND device_id = ?"
+            params.append(device_id)
+        sql += " ORDER BY bucket, device_id"
+        points = []
+        for row in self.db.query(sql, params):
+            device, bucket, n = row[0], row[1], row[2]
+            p = {"device_id": device, "t": bucket, "n": n}
+            for i, m in enumerate(METRICS):
+                mn, mx, total = row[3 + i * 3: 6 + i * 3]
+                p[m] = {"min": mn, "max": mx, "avg": round(total / n, 3) if total is not None and n else None}
+            points.append(p)
+        return points
@@ -0,0 +1,100 @@
+import time
+import queue
+import threading
+from collections import deque
+
+
+class WorkerPool:
+    """백그라운드 작업 스레드 풀 (업로드된 사진 자동 진단 등)
+
+    submit()은 큐에 넣기만 하고 바로 반환한다. 워커가 handler(job)을 실행하며
+    큐 길이, 워커 사용률, 작업별 처리 시간을 기록한다.
+    """
+
+    def __init__(self, handler, num_workers=2, name="worker", max_queue=0, latency_window=500):
+        self.handler = handler
+        self.num_workers = num_workers
+        self._q = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)  # 최근 작업 처리 시간(초)
+        self._busy = 0
+        self._busy_time = 0.0
+        self._started = time.monotonic()
+        self.done = 0
+        self.failed = 0
+        self.dropped = 0
+
+        self._threads = []
+        for i in range(num_workers):
+            t = threading.Thread(target=self._loop, name=f"{name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, job):
+        """작업 추가. 큐가 가득 차 있으면 False"""
+        try:
+            self._q.put_nowait((time.monotonic(), job))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def stop(self):
+        for _ in self._threads:
+            self._q.put(None)
+        for t in self._threads:
+            t.join(timeout=5)
+
+    def _loop(self):
+        while True:
+            item = self._q.get()
+            if item is None:
+                break
+            queued_at, job = item
+            t0 = time.monotonic()
+            with self._lock:
+                self._busy += 1
+            ok = True
+            try:
+                self.handler(job)
+            except Exception as e:
+                ok = False
+                print(f"[백그라운드 작업 오류] {job}: {e}")
+            t1 = time.monotonic()
+            with self._lock:
+                self._busy -= 1
+                self._busy_time += t1 - t0
+                # 큐 대기 시간까지 포함한 전체 처리 시간
+                self._latencies.append(t1 - queued_at)
+                if ok:
+                    self.done += 1
+                else:
+                    self.failed += 1
+
+    def stats(self):
+        with self._lock:
+            lat = sorted(self._latencies)
+            elapsed = max(time.monotonic() - self._started, 1e-9)
+            busy = self._busy
+            busy_time = self._busy_time
+            done, failed, dropped = self.done, self.failed, self.dropped
+
+        def pct(p):
+            return round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1000, 2) if lat else None
+
+        return {
+            "workers": self.num_workers,
+            "busy": busy,
+            "utilization": round(busy_time / (elapsed * self.num_workers), 4),
+            "queue_depth": self._q.qsize(),
+            "done": done,
+            "failed": failed,
+            "dropped": dropped,
+            "latency_ms": {
+                "avg": round(sum(lat) / len(lat) * 1000, 2) if lat else None,
+                "p50": pct(0.50),
+                "p95": pct(0.95),
+                "p99": pct(0.99),
+            },
+        }
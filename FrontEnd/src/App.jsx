@@ -35,8 +35,17 @@ function App() {
       }
     };
     fetchSensor();
-    const interval = setInterval(fetchSensor, 5000);
-    return () => clearInterval(interval);
+
+    // 서버가 새 센서값/업로드/진단 결과를 바로 보내줌 (SSE 미지원 브라우저만 5초 폴링)
+    if (!window.EventSource) {
+      const interval = setInterval(fetchSensor, 5000);
+      return () => clearInterval(interval);
+    }
+    const es = new EventSource("/api/events");
+    es.addEventListener("sensor", (e) => setSensorData(JSON.parse(e.data)));
+    es.addEventListener("upload", fetchUploadedImages);
+    es.addEventListener("diagnosis", fetchUploadedImages);
+    return () => es.close();
   }, []);
 
   const handleFileChange = (e) => {
@@ -160,7 +169,7 @@ function App() {
               <div style={{ display: 'grid', gridTemplateColumns: 'repeat(auto-fill, minmax(200px, 1fr))', gap: '12px', marginTop: '12px' }}>
                 {uploadedImages.map((img, idx) => (
                   <div key={idx} onClick={() => handleSelectFromGallery(img.url, img.filename)} style={{ cursor: 'pointer' }}>
-                    <img src={img.url} alt={img.filename} style={{ width: '100%', height: '150px', objectFit: 'cover', borderRadius: '8px' }} />
+                    <img src={img.thumb_url || img.url} alt={img.filename} loading="lazy" style={{ width: '100%', height: '150px', objectFit: 'cover', borderRadius: '8px' }} />
                     <p style={{ textAlign: 'center', fontSize: '12px' }}>{img.timestamp}</p>
                   </div>
                 ))}
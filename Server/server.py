@@ -1,6 +1,8 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import os
+import hashlib
+import tempfile
 from datetime import datetime
 
 # 🔵 반드시 route보다 먼저 있어야 함
@@ -10,6 +12,36 @@ CORS(app)
 UPLOAD_FOLDER = 'uploads'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+CHUNK_SIZE = 64 * 1024
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+
+
+def save_jpeg_stream(stream, filepath):
+    """요청 본문을 조각째 임시 파일에 쓰면서 JPEG 헤더/크기 확인 + 해시 계산, 끝나면 filepath로 이동"""
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_FOLDER, prefix=".upload-", suffix=".part")
+    digest = hashlib.blake2b(digest_size=16)
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if size == 0 and not chunk.startswith(b"\xff\xd8"):
+                    raise ValueError("not a JPEG image")
+                size += len(chunk)
+                if size > MAX_IMAGE_BYTES:
+                    raise ValueError(f"image larger than {MAX_IMAGE_BYTES} bytes")
+                digest.update(chunk)
+                f.write(chunk)
+        if size == 0:
+            raise ValueError("empty body")
+        os.replace(tmp_path, filepath)
+        return size, digest.hexdigest()
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
 @app.route('/upload', methods=['POST', 'GET'])
 def upload():
     if request.method == 'GET':
@@ -25,15 +57,17 @@ def upload():
     print(f"Content-Type: {content_type}")
 
     if content_type == "image/jpeg":
-        image_data = request.get_data()
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"esp32_{timestamp}.jpg"
         filepath = os.path.join(UPLOAD_FOLDER, filename)
 
-        with open(filepath, 'wb') as f:
-            f.write(image_data)
+        try:
+            size, digest = save_jpeg_stream(request.stream, filepath)
+        except ValueError as e:
+            print(f"[✖] ESP32 image rejected: {e}")
+            return str(e), 400
 
-        print(f"[✔] ESP32 image saved to {filepath}")
+        print(f"[✔] ESP32 image saved to {filepath} ({size} bytes, {digest})")
         return "Image received and saved", 200
 
     image = request.files.get('image')